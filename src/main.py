@@ -1,12 +1,14 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from loguru import logger
 import asyncio
 
 from .settings import get_settings
-from .router import upload, chat
+from .router import upload, chat, admin
+from .utils.admission import AdmissionController
+from .utils.clients import get_redis
 
 # Load settings
 settings = get_settings()
@@ -16,7 +18,8 @@ logger.add(
     "logs/app.log",
     rotation="500 MB",
     retention="10 days",
-    level="INFO"
+    level="INFO",
+    enqueue=True  # Write from a background thread, off the event loop
 )
 
 @asynccontextmanager
@@ -28,12 +31,19 @@ async def lifespan(app: FastAPI):
 
     # Service Startup...
     app.state.max_workers = settings.MAX_WORKERS
-    app.state.processing_semaphore = asyncio.Semaphore(settings.MAX_WORKERS)
+    app.state.admission = AdmissionController(settings.MAX_WORKERS)
+    admission_sync = asyncio.create_task(app.state.admission.follow(get_redis()))
+    await chat.manager.ensure_indexes()
+    await upload.task_manager.ensure_indexes()
+    await upload.task_manager.start()
     logger.info(f"Server starting with {settings.MAX_WORKERS} workers")
     
     yield  # Server is running
     
     # Service Shutdown
+    admission_sync.cancel()
+    await asyncio.gather(admission_sync, return_exceptions=True)
+    await upload.task_manager.stop()
     logger.info("Server shutting down")
 
 # Initialize FastAPI app
@@ -43,6 +53,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -68,13 +79,19 @@ app.include_router(
     tags=["Chat"]
 )
 
+app.include_router(
+    admin.router,
+    prefix=f"{settings.API_V1_PREFIX}/admin",
+    tags=["Admin"]
+)
+
 # Health check endpoint
 @app.get("/", include_in_schema=False)
 async def root_handler():
     """Health check endpoint."""
     return {
         "status": "healthy",
-        "workers": settings.MAX_WORKERS,
+        "workers": app.state.max_workers,
         "version": "1.0.0"
     }
 
@@ -88,7 +105,7 @@ async def health_check():
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Handle HTTP exceptions."""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
     )
@@ -97,7 +114,7 @@ async def http_exception_handler(request, exc):
 async def general_exception_handler(request, exc):
     """Handle general exceptions."""
     logger.exception("Unhandled exception")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
     )
\ No newline at end of file
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Request
+from pydantic import BaseModel, Field
+
+from ..utils.clients import get_redis
+
+router = APIRouter()
+
+class AdmissionLimitRequest(BaseModel):
+    """Admission limit update request model."""
+    limit: int = Field(..., gt=0)
+
+class AdmissionStatusResponse(BaseModel):
+    """Admission controller status of the server process that served the request."""
+    limit: int  # Per-process limit, shared by every process
+    active: int  # Requests in flight in this process only
+
+@router.get("/admission", response_model=AdmissionStatusResponse)
+async def get_admission(request: Request):
+    """Get the admission limit and the number of requests in flight in this process."""
+    admission = request.app.state.admission
+    return AdmissionStatusResponse(limit=admission.limit, active=admission.active)
+
+@router.put("/admission", response_model=AdmissionStatusResponse)
+async def set_admission_limit(request: Request, body: AdmissionLimitRequest):
+    """
+    Resize the chat admission limit without restarting the server.
+
+    The limit applies per server process. It is stored in Redis and
+    announced to every process, which applies it to its own controller.
+
+    Args:
+        body: New concurrency limit
+
+    Returns:
+        AdmissionStatusResponse: Updated admission status
+    """
+    admission = request.app.state.admission
+    await admission.set_limit(body.limit)
+    await admission.publish_limit(get_redis(), body.limit)
+    return AdmissionStatusResponse(limit=admission.limit, active=admission.active)
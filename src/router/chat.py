@@ -1,15 +1,19 @@
-from typing import Dict, Any, List
-import json
+from typing import Dict, Any, List, NamedTuple, AsyncIterator
+from collections import OrderedDict
+from contextlib import aclosing
+import asyncio
 import uuid
-import traceback
 from datetime import datetime
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from loguru import logger
-from motor.motor_asyncio import AsyncIOMotorClient
+import orjson
+from pymongo import UpdateOne
 
 from ..settings import get_settings
+from ..utils.clients import get_mongo
 from ..utils.vector_store import VectorStore
 from ..utils.llm import GroqLLM
 
@@ -21,25 +25,78 @@ router = APIRouter()
 vector_store = VectorStore()
 llm = GroqLLM()
 
+_DEFAULT_FEEDBACK = {
+    "thumbs": None,  # "up" or "down"
+    "comment": None,  # Optional feedback comment
+    "submitted_at": None  # Timestamp when feedback was submitted
+}
+
 class ChatMessage(BaseModel):
     """Chat message model."""
     role: str
     content: str
     timestamp: datetime = None
-    feedback: Dict[str, Any] = {
-        "thumbs": None,  # "up" or "down"
-        "comment": None,  # Optional feedback comment
-        "submitted_at": None  # Timestamp when feedback was submitted
-    }
+    feedback: Dict[str, Any] = _DEFAULT_FEEDBACK
 
     def to_dict(self) -> Dict[str, Any]:
-        """Convert message to dictionary with ISO formatted timestamp."""
-        data = self.model_dump()
-        if self.timestamp:
-            data["timestamp"] = self.timestamp.isoformat()
-        if self.feedback and self.feedback.get("submitted_at"):
-            data["feedback"]["submitted_at"] = self.feedback["submitted_at"].isoformat()
-        return data
+        """
+        Convert message to dictionary.
+        
+        Datetimes are kept as-is: MongoDB stores them natively and orjson
+        serializes them to ISO 8601 when the message is sent to a client.
+        """
+        # Built by hand: model_dump walks and copies every field on each call
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.timestamp,
+            "feedback": dict(self.feedback or _DEFAULT_FEEDBACK)
+        }
+
+BASIC_SYSTEM_PROMPT = """
+Answer according to user language, also consider conversation history if necessary to answer question.
+You are a helpful and friendly AI assistant.
+Engage in natural conversation and provide accurate, concise responses.
+If the user mentions something vague or unclear, politely ask for clarification or context
+to ensure you provide the most relevant and helpful answer.
+If the user refers to specific documents or information,
+let them know you can search through the knowledge base to assist them.
+"""
+
+RAG_SYSTEM_PROMPT = """
+Answer according to user language, also consider conversation history if necessary to answer question.
+You are a helpful AI assistant with access to a knowledge base of documents.
+Use the provided context to answer questions accurately and comprehensively.
+
+For each response:
+1. Analyze the provided context and cite specific sources using page numbers
+2. Structure your response to clearly separate information from different sources
+3. When citing information, use the format: [Source: filename, Page: X]
+4. If multiple sources support a point, cite all relevant sources
+5. If the context doesn't fully address the question, clearly state what information is from the sources and what is general knowledge
+
+Always maintain accuracy over completeness. If you're unsure about something, acknowledge your uncertainty and explain what evidence you do have from the sources.
+
+Remember to:
+- Provide page numbers for all cited information
+- Distinguish between direct quotes and paraphrased content
+- Note any conflicting information between sources
+- Be transparent about gaps in the provided context
+"""
+
+TITLE_SYSTEM_PROMPT = """You are a helpful assistant that generates concise conversation titles.
+Create a brief, descriptive title (maximum 6 words) based on the user's first message.
+The title should capture the main topic or intent. Respond with ONLY the title, no other text."""
+
+SUMMARY_SYSTEM_PROMPT = """You are a helpful assistant that maintains a running summary of a conversation.
+Merge the previous summary (if any) with the new messages into a single summary of at most 150 words.
+Keep names, facts, decisions and open questions. Respond with ONLY the summary, no other text."""
+
+# Shared system messages; LLM clients only read them, so reuse is safe
+BASIC_SYSTEM_MESSAGE = {"role": "system", "content": BASIC_SYSTEM_PROMPT}
+RAG_SYSTEM_MESSAGE = {"role": "system", "content": RAG_SYSTEM_PROMPT}
+TITLE_SYSTEM_MESSAGE = {"role": "system", "content": TITLE_SYSTEM_PROMPT}
+SUMMARY_SYSTEM_MESSAGE = {"role": "system", "content": SUMMARY_SYSTEM_PROMPT}
 
 class ConversationResponse(BaseModel):
     """Response model for conversation operations."""
@@ -60,13 +117,52 @@ class Conversation(BaseModel):
     created_at: datetime = None
     updated_at: datetime = None
 
+class Connection(NamedTuple):
+    """An accepted WebSocket with its outbound queue and writer task."""
+    websocket: WebSocket
+    queue: asyncio.Queue
+    writer: asyncio.Task
+
+class CachedConversation(NamedTuple):
+    """A cached prompt window with the stored version it was read at."""
+    version: int
+    conversation: Conversation
+
+def conversation_from_document(document: Dict[str, Any]) -> Conversation:
+    """
+    Build a Conversation from a stored document without re-validating it.
+    
+    Documents were validated when written, so the read path skips pydantic
+    validation of every message.
+    """
+    return Conversation.model_construct(**{
+        **document,
+        "messages": [ChatMessage.model_construct(**message) for message in document.get("messages", [])]
+    })
+
 class ConnectionManager:
-    """Manages WebSocket connections."""
+    """
+    Manages WebSocket connections and a cache of conversation histories.
+    
+    Every write to a conversation increments its stored version. Cached
+    histories are checked against that version on each read, so turns
+    written by other server processes are never missed.
+    """
+    
+    CACHE_SIZE = 1024
+    QUEUE_SIZE = 256
+    SEND_TIMEOUT = 10.0
     
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.mongo_client = AsyncIOMotorClient(settings.MONGODB_URL)
+        self.active_connections: Dict[str, Connection] = {}
+        self.mongo_client = get_mongo()
         self.db = self.mongo_client[settings.MONGODB_DB_NAME]
+        self._cache: OrderedDict[str, CachedConversation] = OrderedDict()
+    
+    async def ensure_indexes(self):
+        """Create the indexes used by conversation lookups and listing."""
+        await self.db.conversations.create_index("id", unique=True)
+        await self.db.conversations.create_index([("updated_at", -1)])
     
     async def connect(self, websocket: WebSocket, conversation_id: str):
         """Connect a new client."""
@@ -76,54 +172,291 @@ class ConnectionManager:
             raise HTTPException(status_code=404, detail="Conversation not found")
             
         await websocket.accept()
-        self.active_connections[conversation_id] = websocket
+        self.disconnect(conversation_id)
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        writer = asyncio.create_task(self._writer_loop(conversation_id, websocket, queue))
+        self.active_connections[conversation_id] = Connection(websocket, queue, writer)
         logger.info(f"Client connected to conversation {conversation_id}")
     
-    def disconnect(self, conversation_id: str):
-        """Disconnect a client."""
-        if conversation_id in self.active_connections:
-            del self.active_connections[conversation_id]
+    def _unregister(self, conversation_id: str, websocket: WebSocket = None) -> Connection | None:
+        """
+        Remove a connection from the registry.
+        
+        With a websocket given, the entry is only removed while it still
+        belongs to that socket, so a stale handler cannot drop a newer one.
+        """
+        connection = self.active_connections.get(conversation_id)
+        if connection is None or (websocket is not None and connection.websocket is not websocket):
+            return None
+        del self.active_connections[conversation_id]
+        return connection
+    
+    def disconnect(self, conversation_id: str, websocket: WebSocket = None):
+        """Disconnect a client, optionally only if it is still the given socket."""
+        connection = self._unregister(conversation_id, websocket)
+        if connection is not None:
+            connection.writer.cancel()
             logger.info(f"Client disconnected from conversation {conversation_id}")
     
+    async def _writer_loop(self, conversation_id: str, websocket: WebSocket, queue: asyncio.Queue):
+        """Write queued frames to the socket so senders never await the network."""
+        try:
+            while True:
+                frame = await queue.get()
+                await websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"WebSocket writer stopped: {str(e)}")
+            # Nothing drains the queue any more; stop senders from filling it
+            self._unregister(conversation_id, websocket)
+    
+    async def send_payload(self, conversation_id: str, payload: Dict[str, Any]):
+        """
+        Queue a JSON payload for a specific client.
+        
+        The queue is bounded, so a client that stops reading applies
+        backpressure to its sender. A client that stays blocked for
+        SEND_TIMEOUT seconds is disconnected and the payload dropped, so a
+        sender never waits forever while holding an admission slot.
+        """
+        connection = self.active_connections.get(conversation_id)
+        if connection is None or connection.writer.done():
+            return
+        try:
+            await asyncio.wait_for(
+                connection.queue.put(orjson.dumps(payload).decode()),
+                self.SEND_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Client of conversation {conversation_id} stopped reading, disconnecting")
+            self.disconnect(conversation_id, connection.websocket)
+    
     async def send_message(self, conversation_id: str, message: ChatMessage):
         """Send a message to a specific client."""
-        if conversation_id in self.active_connections:
-            websocket = self.active_connections[conversation_id]
-            await websocket.send_json(message.to_dict())
+        await self.send_payload(conversation_id, message.to_dict())
     
-    async def get_conversation_history(self, conversation_id: str) -> Conversation:
-        """Get conversation history from MongoDB."""
+    def _cache_put(self, version: int, conversation: Conversation):
+        """Store a conversation as most recently used, evicting the oldest entry."""
+        self._cache[conversation.id] = CachedConversation(version, conversation)
+        self._cache.move_to_end(conversation.id)
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+    
+    def _cached_version(self, conversation_id: str) -> int | None:
+        """Version of the cached conversation, recorded before a write."""
+        entry = self._cache.get(conversation_id)
+        return entry.version if entry is not None else None
+    
+    def _cache_bump(self, conversation_id: str, version: int | None) -> Conversation | None:
+        """
+        Account for one of our own writes in the cached version.
+        
+        The cache is only updated if it still holds the version recorded
+        before the write; an entry refetched meanwhile may already contain
+        the write, so it is dropped instead. If another process wrote in
+        between, the cached version still lags the stored one and the next
+        read refetches the conversation.
+        
+        Args:
+            conversation_id: Conversation identifier
+            version: Cached version recorded before the write
+            
+        Returns:
+            Conversation | None: The cached conversation, to update in place
+        """
+        entry = self._cache.get(conversation_id)
+        if entry is None or version is None:
+            return None
+        if entry.version != version:
+            self.invalidate(conversation_id)
+            return None
+        self._cache[conversation_id] = entry._replace(version=entry.version + 1)
+        return entry.conversation
+    
+    def invalidate(self, conversation_id: str):
+        """Drop a conversation from the cache."""
+        self._cache.pop(conversation_id, None)
+    
+    async def get_conversation(self, conversation_id: str) -> Conversation:
+        """Get a conversation with its full message history from MongoDB."""
         conversation = await self.db.conversations.find_one({"id": conversation_id})
         if conversation:
             return Conversation(**conversation)
         return None
     
-    async def save_message(self, conversation_id: str, message: ChatMessage):
-        """Save a message to conversation history."""
+    async def get_conversation_history(self, conversation_id: str) -> Conversation:
+        """
+        Get a conversation holding only its last N_LAST_MESSAGE messages.
+        
+        Served from the cache when its version matches the stored one;
+        otherwise MongoDB trims the messages array server-side so only the
+        prompt window is transferred.
+        """
+        entry = self._cache.get(conversation_id)
+        if entry is not None:
+            stored = await self.db.conversations.find_one(
+                {"id": conversation_id},
+                {"version": 1, "_id": 0}
+            )
+            if stored is None:
+                self.invalidate(conversation_id)
+                return None
+            if stored.get("version", 0) == entry.version:
+                self._cache.move_to_end(conversation_id)
+                return entry.conversation
+        
+        conversation = await self.db.conversations.find_one(
+            {"id": conversation_id},
+            {
+                "messages": {"$slice": settings.N_LAST_MESSAGE},
+                "id": 1,
+                "title": 1,
+                "metadata": 1,
+                "created_at": 1,
+                "updated_at": 1,
+                "version": 1
+            }
+        )
+        if conversation:
+            version = conversation.pop("version", 0)
+            conversation = conversation_from_document(conversation)
+            self._cache_put(version, conversation)
+            return conversation
+        return None
+    
+    async def get_message_count(self, conversation_id: str) -> int:
+        """Count the messages of a conversation without transferring them."""
+        cursor = self.db.conversations.aggregate([
+            {"$match": {"id": conversation_id}},
+            {"$project": {"count": {"$size": {"$ifNull": ["$messages", []]}}}}
+        ])
+        async for doc in cursor:
+            return doc["count"]
+        return 0
+    
+    async def bulk_apply(self, conversation_id: str, ops: List[UpdateOne]):
+        """Apply a batch of conversation updates in a single round trip."""
+        if ops:
+            await self.db.conversations.bulk_write(ops, ordered=False)
+            logger.debug(f"Applied {len(ops)} update(s) to conversation {conversation_id}")
+    
+    async def save_messages(
+        self,
+        conversation_id: str,
+        messages: List[ChatMessage],
+        fields: Dict[str, Any] = None
+    ):
+        """
+        Append messages to the conversation history in a single write.
+        
+        Args:
+            conversation_id: Conversation identifier
+            messages: Messages to append, in order
+            fields: Optional extra fields to $set in the same update (e.g. title)
+        """
         now = datetime.utcnow()
-        message.timestamp = now
+        for message in messages:
+            if message.timestamp is None:
+                message.timestamp = now
+        
+        fields = fields or {}
+        set_on_insert = {"id": conversation_id, "created_at": now}
+        if not any(key.startswith("metadata") for key in fields):
+            set_on_insert["metadata"] = {}
         
         # Update or create conversation
+        version = self._cached_version(conversation_id)
+        await self.bulk_apply(conversation_id, [
+            UpdateOne(
+                {"id": conversation_id},
+                {
+                    "$push": {"messages": {"$each": [message.to_dict() for message in messages]}},
+                    "$set": {"updated_at": now, **fields},
+                    "$inc": {"version": 1},
+                    "$setOnInsert": set_on_insert
+                },
+                upsert=True
+            )
+        ])
+        
+        # Keep the cached history in sync with the stored one
+        if fields:
+            self.invalidate(conversation_id)
+            return
+        conversation = self._cache_bump(conversation_id, version)
+        if conversation is not None:
+            conversation.messages.extend(messages)
+            del conversation.messages[:settings.N_LAST_MESSAGE]
+            conversation.updated_at = now
+            self._cache.move_to_end(conversation_id)
+    
+    async def save_message(self, conversation_id: str, message: ChatMessage):
+        """Save a message to conversation history."""
+        await self.save_messages(conversation_id, [message])
+    
+    async def get_messages(self, conversation_id: str, start: int, count: int) -> List[ChatMessage]:
+        """Get a range of messages, sliced server-side."""
+        conversation = await self.db.conversations.find_one(
+            {"id": conversation_id},
+            {"messages": {"$slice": [start, count]}, "id": 1}
+        )
+        if not conversation:
+            return []
+        return [ChatMessage.model_construct(**message) for message in conversation.get("messages", [])]
+    
+    async def update_summary(self, conversation_id: str, summary: str, summarized_count: int):
+        """
+        Store the rolling summary of a conversation.
+        
+        Args:
+            conversation_id: Conversation identifier
+            summary: Summary of every message before summarized_count
+            summarized_count: Number of leading messages covered by the summary
+        """
+        version = self._cached_version(conversation_id)
         await self.db.conversations.update_one(
             {"id": conversation_id},
             {
-                "$push": {"messages": message.to_dict()},
-                "$set": {"updated_at": now},
-                "$setOnInsert": {
-                    "id": conversation_id,
-                    "created_at": now,
-                    "metadata": {}
-                }
-            },
-            upsert=True
+                "$set": {
+                    "metadata.summary": summary,
+                    "metadata.summarized_count": summarized_count
+                },
+                "$inc": {"version": 1}
+            }
+        )
+        conversation = self._cache_bump(conversation_id, version)
+        if conversation is not None:
+            conversation.metadata["summary"] = summary
+            conversation.metadata["summarized_count"] = summarized_count
+    
+    async def claim_title_generation(self, conversation_id: str) -> bool:
+        """
+        Atomically mark the conversation title as generated.
+        
+        Returns:
+            bool: True only for the single caller that flipped the flag
+        """
+        version = self._cached_version(conversation_id)
+        claimed = await self.db.conversations.find_one_and_update(
+            {"id": conversation_id, "metadata.title_generated": {"$ne": True}},
+            {"$set": {"metadata.title_generated": True}, "$inc": {"version": 1}},
+            projection={"_id": 1}
         )
+        if claimed is None:
+            return False
+        conversation = self._cache_bump(conversation_id, version)
+        if conversation is not None:
+            conversation.metadata["title_generated"] = True
+        return True
     
     async def update_title(self, conversation_id: str, title: str):
         """Update conversation title."""
         await self.db.conversations.update_one(
             {"id": conversation_id},
-            {"$set": {"title": title}}
+            {"$set": {"title": title}, "$inc": {"version": 1}}
         )
+        self.invalidate(conversation_id)
         logger.info(f"Updated title for conversation {conversation_id}: {title}")
 
 # Initialize connection manager
@@ -132,6 +465,7 @@ manager = ConnectionManager()
 class ChatRequest(BaseModel):
     """Chat request model."""
     message: str
+    stream: bool = False  # Stream the response as server-sent events
 
 class ChatResponse(BaseModel):
     """Chat response model."""
@@ -167,7 +501,8 @@ async def create_conversation():
         "metadata": metadata,
         "messages": [],
         "created_at": now,
-        "updated_at": now
+        "updated_at": now,
+        "version": 0
     }
     
     await manager.db.conversations.insert_one(conversation_data)
@@ -186,21 +521,32 @@ async def create_conversation():
 async def list_conversations(skip: int = 0, limit: int = 10):
     """List all conversations."""
     conversations = []
-    cursor = manager.db.conversations.find().sort("updated_at", -1).skip(skip).limit(limit)
+    # Count messages and pick the last one server-side instead of loading every array
+    cursor = manager.db.conversations.aggregate([
+        {"$sort": {"updated_at": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": {
+            "id": 1,
+            "title": 1,
+            "metadata": 1,
+            "created_at": 1,
+            "updated_at": 1,
+            "message_count": {"$size": {"$ifNull": ["$messages", []]}},
+            "last_message": {"$arrayElemAt": ["$messages", -1]}
+        }}
+    ])
     
     async for conv in cursor:
-        last_message = None
-        messages = conv.get("messages", [])
-        if messages:
-            last_message = ChatMessage(**messages[-1])
+        last_message = conv.get("last_message")
         conversations.append(ConversationResponse(
             id=conv["id"],
             title=conv.get("title", "New Conversation"),
             metadata=conv.get("metadata", {}),
             created_at=conv["created_at"],
             updated_at=conv.get("updated_at"),
-            message_count=len(messages),
-            last_message=last_message
+            message_count=conv["message_count"],
+            last_message=ChatMessage.model_construct(**last_message) if last_message else None
         ))
     
     return conversations
@@ -208,7 +554,7 @@ async def list_conversations(skip: int = 0, limit: int = 10):
 @router.get("/conversations/{conversation_id}", response_model=Conversation)
 async def get_conversation(conversation_id: str):
     """Get a specific conversation."""
-    conversation = await manager.get_conversation_history(conversation_id)
+    conversation = await manager.get_conversation(conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
@@ -221,19 +567,16 @@ async def delete_conversation(conversation_id: str):
         raise HTTPException(status_code=404, detail="Conversation not found")
     
     # Disconnect any active WebSocket connections
+    manager.invalidate(conversation_id)
     manager.disconnect(conversation_id)
     return {"status": "success", "message": "Conversation deleted"}
 
 async def generate_title(message: str) -> str:
     """Generate a concise title from the first message using LLM."""
     try:
-        system_prompt = """You are a helpful assistant that generates concise conversation titles. 
-        Create a brief, descriptive title (maximum 6 words) based on the user's first message.
-        The title should capture the main topic or intent. Respond with ONLY the title, no other text."""
-        
         response = await llm.chat_completion(
             messages=[
-                {"role": "system", "content": system_prompt},
+                TITLE_SYSTEM_MESSAGE,
                 {"role": "user", "content": f"Generate a title for this conversation that starts with: {message}"}
             ],
             temperature=settings.TEMPERATURE,
@@ -244,20 +587,213 @@ async def generate_title(message: str) -> str:
         title = response.strip("'").strip('"').strip()
         return title
         
-    except Exception as e:
-        traceback.print_exc()
-        logger.error(f"Error generating title: {str(e)}")
+    except Exception:
+        logger.exception("Error generating title")
         return "New Conversation"  # Fallback title
 
+def build_messages(
+    history: List[ChatMessage],
+    context: List[Dict[str, Any]],
+    question: str,
+    summary: str | None = None
+) -> tuple[List[Dict[str, str]], bool]:
+    """
+    Assemble the LLM messages for a chat turn.
+    
+    Args:
+        history: Recent conversation messages
+        context: Documents retrieved from the vector store
+        question: The user's message
+        summary: Optional rolling summary of older messages
+        
+    Returns:
+        Tuple of (messages, whether this is a basic conversation without RAG context)
+    """
+    # Determine if this is a basic conversation or needs context
+    logger.info("Determine Route Conversation (Basic / RAG)")
+    is_basic_conversation = len(context) == 0 or all(c['score'] < settings.RAG_THRESHOLD for c in context)
+    
+    # Prepare conversation context
+    conversation_context = "\n".join(
+        ["Conversation History:", *(f"{message.role}: {message.content}" for message in history)]
+    )
+    if summary:
+        conversation_context = f"Conversation Summary:\n{summary}\n\n{conversation_context}"
+    
+    if is_basic_conversation:
+        return [
+            BASIC_SYSTEM_MESSAGE,
+            {"role": "user", "content": conversation_context},
+            {"role": "user", "content": question}
+        ], True
+    
+    context_knowledge = "\n\n".join(
+        f"{cont['text']}\nSource: {cont['file_path']} - Page Number: {cont['page_number']}"
+        for cont in context
+    )
+    return [
+        RAG_SYSTEM_MESSAGE,
+        {"role": "user", "content": conversation_context},
+        {"role": "user", "content": f"Context: {context_knowledge}\nQuestion: {question}"}
+    ], False
+
+_summary_tasks: Dict[str, asyncio.Task] = {}
+
+async def summarize_conversation(conversation_id: str):
+    """
+    Fold messages that left the prompt window into the rolling summary.
+    
+    Runs only once SUMMARY_INTERVAL turns have dropped out of the last
+    N_LAST_MESSAGE window, so the prompt stays bounded as the conversation
+    grows while the summary is refreshed at most every few turns.
+    """
+    try:
+        conversation = await manager.get_conversation_history(conversation_id)
+        if not conversation:
+            return
+        
+        summarized_count = conversation.metadata.get("summarized_count", 0)
+        total = await manager.get_message_count(conversation_id)
+        window_start = max(total + settings.N_LAST_MESSAGE, 0)
+        if window_start - summarized_count < settings.SUMMARY_INTERVAL * 2:
+            return
+        
+        messages = await manager.get_messages(conversation_id, summarized_count, window_start - summarized_count)
+        transcript = "\n".join(f"{message.role}: {message.content}" for message in messages)
+        previous = conversation.metadata.get("summary")
+        content = f"Previous summary:\n{previous}\n\n" if previous else ""
+        content += f"New messages:\n{transcript}"
+        
+        summary = await llm.chat_completion(
+            messages=[SUMMARY_SYSTEM_MESSAGE, {"role": "user", "content": content}],
+            temperature=settings.TEMPERATURE,
+            max_tokens=200
+        )
+        await manager.update_summary(conversation_id, summary, window_start)
+        logger.info(f"Summarized {window_start} messages of conversation {conversation_id}")
+        
+    except Exception:
+        logger.exception("Error summarizing conversation")
+
+def schedule_summary(conversation_id: str):
+    """Refresh the rolling summary in the background unless a refresh is running."""
+    task = _summary_tasks.get(conversation_id)
+    if task is not None and not task.done():
+        return
+    task = asyncio.create_task(summarize_conversation(conversation_id))
+    _summary_tasks[conversation_id] = task
+    task.add_done_callback(
+        lambda done: _summary_tasks.pop(conversation_id, None) if _summary_tasks.get(conversation_id) is done else None
+    )
+
+async def claim_and_generate_title(conversation_id: str, message: str) -> str | None:
+    """Generate a title unless another request already claimed the job."""
+    if not await manager.claim_title_generation(conversation_id):
+        return None
+    return await generate_title(message)
+
+_save_tasks: set[asyncio.Task] = set()
+
+class ChatTurn:
+    """
+    One user message answered end to end, shared by every chat transport.
+    
+    Retrieves context (and the title on the first message), streams the
+    answer from the LLM and persists the turn once the stream ends.
+    """
+    
+    def __init__(self, conversation_id: str, conversation: Conversation | None, user_message: ChatMessage):
+        self.conversation_id = conversation_id
+        self.user_message = user_message
+        self.history = list(conversation.messages) if conversation else []
+        self.summary = conversation.metadata.get("summary") if conversation else None
+        self.is_first_message = not conversation or (
+            not conversation.messages and not conversation.metadata.get("title_generated")
+        )
+        self.title_fields: Dict[str, Any] = {}
+        self.assistant_message: ChatMessage | None = None
+    
+    async def _retrieve_context(self) -> List[Dict[str, Any]]:
+        """Retrieve context, generating the title concurrently on the first message."""
+        logger.info("Retrieve Relevant Context...")
+        search = vector_store.similarity_search(
+            query=self.user_message.content,
+            k=settings.TOP_K
+        )
+        if not self.is_first_message:
+            return await search
+        
+        logger.info("Generate Title...")
+        title, context = await asyncio.gather(
+            claim_and_generate_title(self.conversation_id, self.user_message.content),
+            search,
+            return_exceptions=True
+        )
+        # Keep a claimed title even if retrieval failed
+        if isinstance(title, str):
+            self.title_fields = {"title": title}
+        if isinstance(context, BaseException):
+            raise context
+        return context
+    
+    async def stream(self) -> AsyncIterator[str]:
+        """
+        Yield the answer as it is generated.
+        
+        The turn is saved however the stream ends: the user message and the
+        claimed title are kept even if generation fails or the client goes
+        away, and the save is shielded from the cancellation.
+        """
+        try:
+            context = await self._retrieve_context()
+            
+            # Assemble the prompt (basic or RAG, depending on retrieved context)
+            messages, is_basic_conversation = build_messages(
+                self.history, context, self.user_message.content, self.summary
+            )
+            
+            # Stream the response as it is generated
+            logger.info("LLM Generate Response...")
+            logger.opt(lazy=True).debug("Message Throw: {messages}", messages=lambda: messages)
+            chunks = []
+            async for delta in llm.stream_chat_completion(
+                messages=messages,
+                temperature=settings.TEMPERATURE
+            ):
+                chunks.append(delta)
+                yield delta
+            
+            self.assistant_message = ChatMessage(
+                role="assistant",
+                content="".join(chunks).strip()
+            )
+            logger.info(f"Generated response for {'basic' if is_basic_conversation else 'context-based'} query")
+            logger.opt(lazy=True).debug("{message}", message=self.assistant_message.to_dict)
+        
+        finally:
+            save = asyncio.create_task(self._save())
+            _save_tasks.add(save)
+            save.add_done_callback(_save_tasks.discard)
+            await asyncio.shield(save)
+    
+    async def _save(self):
+        """Save the turn (and the new title) in one write."""
+        if self.assistant_message is None:
+            # Keep the user message even though no answer was produced
+            await manager.save_messages(self.conversation_id, [self.user_message], self.title_fields)
+            return
+        await manager.save_messages(
+            self.conversation_id,
+            [self.user_message, self.assistant_message],
+            self.title_fields
+        )
+        schedule_summary(self.conversation_id)
+
 @router.websocket("/ws/{conversation_id}")
 async def chat_websocket(websocket: WebSocket, conversation_id: str):
     """WebSocket endpoint for chat."""
     try:
         await manager.connect(websocket, conversation_id)
-        
-        # Load conversation history
-        logger.info("Retrieve Conv. History")
-        conversation = await manager.get_conversation_history(conversation_id)
 
         # NOTE: Buat apa?
         # if conversation:
@@ -270,136 +806,74 @@ async def chat_websocket(websocket: WebSocket, conversation_id: str):
             data = await websocket.receive_json()
             user_message = ChatMessage(
                 role="user",
-                content=data["message"]
+                content=data["message"],
+                timestamp=datetime.utcnow()
             )
             
-            # Save user message
-            await manager.save_message(conversation_id, user_message)
+            async with websocket.app.state.admission:
+                # Load conversation history (served from cache after the first turn)
+                logger.info("Retrieve Conv. History")
+                conversation = await manager.get_conversation_history(conversation_id)
+                turn = ChatTurn(conversation_id, conversation, user_message)
             
-            try:
-                # Generate title if this is the first message
-                logger.info("Generate Title...")
-                if not conversation or (not conversation.messages and not conversation.metadata.get("title_generated")):
-                    title = await generate_title(user_message.content)
-                    await manager.update_title(conversation_id, title)
-                    await manager.db.conversations.update_one(
-                        {"id": conversation_id},
-                        {"$set": {"metadata.title_generated": True}}
-                    )
-                
-                # Get relevant context from vector store
-                logger.info("Retrieve Relevant Context...")
-                context = await vector_store.similarity_search(
-                    query=user_message.content,
-                    k=settings.TOP_K
-                )
-                
-                # Determine if this is a basic conversation or needs context
-                logger.info("Determine Route Conversation (Basic / RAG)")
-                is_basic_conversation = len(context) == 0 or all(c['score'] < settings.RAG_THRESHOLD for c in context)
-                
-                # Prepare conversation context
-                conversation_context = ["Conversation History:"]
-                if conversation:
-                    logger.info(conversation.messages)
-                    for message in conversation.messages[settings.N_LAST_MESSAGE:]:
-                        conversation_context.append(f"{message.role}: {message.content}")
-                conversation_context = "\n".join(conversation_context)
-                
-                # Select appropriate system prompt based on query type
-                if is_basic_conversation:
-                    system_prompt = """
-                    Answer accoding user language, also consider conversation history if necessary to answer question.
-                    You are a helpful and friendly AI assistant. 
-                    Engage in natural conversation and provide accurate, concise responses. 
-                    If the user mentions something vague or unclear, politely ask for clarification or context 
-                    to ensure you provide the most relevant and helpful answer. 
-                    If the user refers to specific documents or information, 
-                    let them know you can search through the knowledge base to assist them.
-                    """
-                    
-                    messages = [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": conversation_context},
-                        {"role": "user", "content": user_message.content}
-                    ]
-                else:
-                    system_prompt = """
-                    Answer according to user language, also consider conversation history if necessary to answer question.
-                    You are a helpful AI assistant with access to a knowledge base of documents.
-                    Use the provided context to answer questions accurately and comprehensively.
-                    
-                    For each response:
-                    1. Analyze the provided context and cite specific sources using page numbers
-                    2. Structure your response to clearly separate information from different sources
-                    3. When citing information, use the format: [Source: filename, Page: X]
-                    4. If multiple sources support a point, cite all relevant sources
-                    5. If the context doesn't fully address the question, clearly state what information is from the sources and what is general knowledge
-                    
-                    Always maintain accuracy over completeness. If you're unsure about something, acknowledge your uncertainty and explain what evidence you do have from the sources.
-                    
-                    Remember to:
-                    - Provide page numbers for all cited information
-                    - Distinguish between direct quotes and paraphrased content
-                    - Note any conflicting information between sources
-                    - Be transparent about gaps in the provided context
-                    """
-                    context_knowledge = [f"{cont['text']}\nSource: {cont['file_path']} - Page Number: {cont['page_number']}" for cont in context]
-                    context_knowledge = "\n".join(context_knowledge)
-                    messages = [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": conversation_context},
-                        {
-                            "role": "user", 
-                            "content": f"""
-                        Context: {context_knowledge}
-                        Question: {user_message.content}
-                        """}
-                    ]
-                
-                # Generate response using LLM
-                logger.info("LLM Generate Response...")
-                logger.info(f"Message Throw: {messages}")
-                response = await llm.chat_completion(
-                    messages=messages,
-                    temperature=settings.TEMPERATURE
-                )
-                
-                # Create assistant message
-                assistant_message = ChatMessage(
-                    role="assistant",
-                    content=response
-                )
-                logger.info(f"Generated response for {'basic' if is_basic_conversation else 'context-based'} query")
-                logger.info(assistant_message.to_dict())
+                try:
+                    # Stream the response to the client as it is generated
+                    async with aclosing(turn.stream()) as deltas:
+                        async for delta in deltas:
+                            await manager.send_payload(conversation_id, {"role": "assistant", "delta": delta})
                 
-                # Save assistant message
-                await manager.save_message(conversation_id, assistant_message)
+                    # Send the complete response to mark the end of the stream
+                    await manager.send_message(conversation_id, turn.assistant_message)
                 
-                # Send response to client
-                await manager.send_message(conversation_id, assistant_message)
-                
-            except Exception as e:
-                traceback.print_exc()
-                logger.error(f"Error processing message: {str(e)}")
-                error_message = ChatMessage(
-                    role="system",
-                    content="I apologize, but I encountered an error processing your message."
-                )
-                await manager.send_message(conversation_id, error_message)
+                except Exception:
+                    logger.exception("Error processing message")
+                    error_message = ChatMessage(
+                        role="system",
+                        content="I apologize, but I encountered an error processing your message."
+                    )
+                    await manager.send_message(conversation_id, error_message)
     
     except WebSocketDisconnect:
-        traceback.print_exc()
-        manager.disconnect(conversation_id)
+        manager.disconnect(conversation_id, websocket)
 
-    except Exception as e:
-        traceback.print_exc()
-        logger.error(f"WebSocket error: {str(e)}")
-        manager.disconnect(conversation_id)
+    except Exception:
+        logger.exception("WebSocket error")
+        manager.disconnect(conversation_id, websocket)
+
+def sse_event(data: Dict[str, Any], event: str = None) -> bytes:
+    """Encode a payload as a server-sent event."""
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+async def stream_chat_events(http_request: Request, turn: ChatTurn):
+    """
+    Answer a chat message as a stream of server-sent events.
+    
+    Yields one event per generated delta, then a "done" event carrying the
+    complete assistant message, or an "error" event if generation failed.
+    """
+    async with http_request.app.state.admission:
+        try:
+            # Closed explicitly so the turn is saved as soon as the client goes away
+            async with aclosing(turn.stream()) as deltas:
+                async for delta in deltas:
+                    yield sse_event({"role": "assistant", "delta": delta})
+            
+            # Send the complete response to mark the end of the stream
+            yield sse_event(turn.assistant_message.to_dict(), event="done")
+        
+        except Exception:
+            logger.exception("Error processing message")
+            yield sse_event({"detail": "An error occurred while processing your message"}, event="error")
 
 @router.post("/{conversation_id}", response_model=ChatResponse)
-async def chat_post(conversation_id: str, request: ChatRequest):
-    """POST endpoint for chat - mirrors WebSocket functionality."""
+async def chat_post(conversation_id: str, request: ChatRequest, http_request: Request):
+    """
+    POST endpoint for chat - mirrors WebSocket functionality.
+    
+    With stream set in the request, the answer is sent as server-sent
+    events as it is generated instead of as a single JSON response.
+    """
     try:
         # Verify conversation exists
         conversation = await manager.get_conversation_history(conversation_id)
@@ -409,113 +883,44 @@ async def chat_post(conversation_id: str, request: ChatRequest):
         # Create user message
         user_message = ChatMessage(
             role="user",
-            content=request.message
+            content=request.message,
+            timestamp=datetime.utcnow()
         )
+        turn = ChatTurn(conversation_id, conversation, user_message)
         
-        # Save user message
-        await manager.save_message(conversation_id, user_message)
-        
-        try:
-            # Generate title if this is the first message
-            logger.info("Generate Title...")
-            if not conversation or (not conversation.messages and not conversation.metadata.get("title_generated")):
-                title = await generate_title(user_message.content)
-                await manager.update_title(conversation_id, title)
-                await manager.db.conversations.update_one(
-                    {"id": conversation_id},
-                    {"$set": {"metadata.title_generated": True}}
-                )
-            
-            # Get relevant context from vector store
-            logger.info("Retrieve Relevant Context...")
-            context = await vector_store.similarity_search(
-                query=user_message.content,
-                k=settings.TOP_K
+        if request.stream:
+            return StreamingResponse(
+                stream_chat_events(http_request, turn),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache"}
             )
-            
-            # Determine if this is a basic conversation or needs context
-            logger.info("Determine Route Conversation (Basic / RAG)")
-            is_basic_conversation = len(context) == 0 or all(c['score'] < settings.RAG_THRESHOLD for c in context)
-            
-            # Prepare conversation context
-            conversation_context = ["Conversation History:"]
-            if conversation:
-                for message in conversation.messages[settings.N_LAST_MESSAGE:]:
-                    conversation_context.append(f"{message.role}: {message.content}")
-            conversation_context = "\n".join(conversation_context)
-            
-            # Select appropriate system prompt based on query type
-            if is_basic_conversation:
-                system_prompt = """
-                Answer accoding user language, also consider conversation history if necessary to answer question.
-                You are a helpful and friendly AI assistant. 
-                Engage in natural conversation and provide accurate, concise responses. 
-                If the user mentions something vague or unclear, politely ask for clarification or context 
-                to ensure you provide the most relevant and helpful answer. 
-                If the user refers to specific documents or information, 
-                let them know you can search through the knowledge base to assist them.
-                """
-                
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": conversation_context},
-                    {"role": "user", "content": user_message.content}
-                ]
-            else:
-                system_prompt = """
-                Answer accoding user language, also consider conversation history if necessary to answer question.
-                You are a helpful AI assistant with access to a knowledge base of documents.
-                Use the provided context to answer questions accurately and comprehensively.
-                If the context doesn't fully address the question, acknowledge what you know from the context
-                and what you're unsure about. Always maintain accuracy over completeness.
-                """
+        
+        async with http_request.app.state.admission:
+            try:
+                # Collect the whole response before answering
+                async with aclosing(turn.stream()) as deltas:
+                    async for _ in deltas:
+                        pass
                 
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": conversation_context},
-                    {"role": "user", "content": f"""Context: {json.dumps([c['text'] for c in context])}
-                    Question: {user_message.content}"""}
-                ]
-            
-            # Generate response using LLM
-            logger.info("LLM Generate Response...")
-            logger.info(f"Message Throw: {messages}")
-            response = await llm.chat_completion(
-                messages=messages,
-                temperature=settings.TEMPERATURE
-            )
-            
-            # Create assistant message
-            assistant_message = ChatMessage(
-                role="assistant",
-                content=response
-            )
-            logger.info(f"Generated response for {'basic' if is_basic_conversation else 'context-based'} query")
-            logger.info(assistant_message.to_dict())
-            
-            # Save assistant message
-            await manager.save_message(conversation_id, assistant_message)
-            
-            # Return the response
-            return ChatResponse(
-                role=assistant_message.role,
-                content=assistant_message.content,
-                timestamp=assistant_message.timestamp
-            )
+                # Return the response
+                assistant_message = turn.assistant_message
+                return ChatResponse(
+                    role=assistant_message.role,
+                    content=assistant_message.content,
+                    timestamp=assistant_message.timestamp
+                )
             
-        except Exception as e:
-            traceback.print_exc()
-            logger.error(f"Error processing message: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail="An error occurred while processing your message"
-            )
+            except Exception:
+                logger.exception("Error processing message")
+                raise HTTPException(
+                    status_code=500,
+                    detail="An error occurred while processing your message"
+                )
     
     except HTTPException:
         raise
-    except Exception as e:
-        traceback.print_exc()
-        logger.error(f"Chat error: {str(e)}")
+    except Exception:
+        logger.exception("Chat error")
         raise HTTPException(
             status_code=500,
             detail="An unexpected error occurred"
@@ -531,21 +936,26 @@ async def submit_feedback(conversation_id: str, message_index: int, feedback: Fe
             raise HTTPException(status_code=404, detail="Conversation not found")
         
         # Validate message index
-        if message_index < 0 or message_index >= len(conversation.messages):
+        message_count = await manager.get_message_count(conversation_id)
+        if message_index < 0 or message_index >= message_count:
             raise HTTPException(status_code=404, detail="Message not found")
         
         # Update feedback in the message
         now = datetime.utcnow()
         await manager.db.conversations.update_one(
             {"id": conversation_id},
-            {"$set": {
-                f"messages.{message_index}.feedback": {
-                    "thumbs": feedback.thumbs,
-                    "comment": feedback.comment,
-                    "submitted_at": now
-                }
-            }}
+            {
+                "$set": {
+                    f"messages.{message_index}.feedback": {
+                        "thumbs": feedback.thumbs,
+                        "comment": feedback.comment,
+                        "submitted_at": now
+                    }
+                },
+                "$inc": {"version": 1}
+            }
         )
+        manager.invalidate(conversation_id)
         
         return {"status": "success", "message": "Feedback submitted successfully"}
         
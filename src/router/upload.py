@@ -1,12 +1,14 @@
+import asyncio
+import time
 from pathlib import Path
 import uuid
-import traceback
-from typing import List
+import shutil
+from typing import List, Dict, Any, BinaryIO
 from datetime import datetime
 
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException
+from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException, Query
 from pydantic import BaseModel
-import aiofiles
+import anyio
 from loguru import logger
 
 from ..settings import get_settings
@@ -16,6 +18,10 @@ settings = get_settings()
 router = APIRouter()
 task_manager = BackgroundTaskManager()
 
+# Long polling of task status: longest allowed wait and database re-check interval (seconds)
+MAX_TASK_WAIT = 30.0
+TASK_WAIT_INTERVAL = 0.5
+
 # Ensure upload directory exists
 upload_dir = Path(settings.PDF_UPLOAD_DIR)
 upload_dir.mkdir(exist_ok=True)
@@ -27,6 +33,45 @@ class TaskResponse(BaseModel):
     status: str
     created_at: datetime
 
+def copy_to_disk(source: BinaryIO, file_path: Path):
+    """Copy an uploaded file to disk in UPLOAD_CHUNK_SIZE pieces (blocking)."""
+    with open(file_path, 'wb') as destination:
+        shutil.copyfileobj(source, destination, length=settings.UPLOAD_CHUNK_SIZE)
+
+async def save_upload(file: UploadFile) -> Dict[str, Any]:
+    """
+    Validate and store an uploaded PDF.
+    
+    Args:
+        file: PDF file to store
+        
+    Returns:
+        Dict[str, Any]: Pending task document for the stored file
+    """
+    # Validate file type
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(
+            status_code=400,
+            detail="Only PDF files are allowed"
+        )
+    
+    # Generate unique filename
+    file_id = str(uuid.uuid4())
+    safe_filename = f"{file_id}_{file.filename}"
+    file_path = upload_dir / safe_filename
+    
+    # Save file in fixed-size chunks with a single thread hop for the whole copy
+    await anyio.to_thread.run_sync(copy_to_disk, file.file, file_path)
+    
+    # Create task
+    return {
+        "task_id": str(uuid.uuid4()),
+        "file_name": file.filename,
+        "file_path": str(file_path),
+        "status": "pending",
+        "created_at": datetime.utcnow()
+    }
+
 @router.post("/upload", response_model=TaskResponse)
 async def upload_single_file(
     file: UploadFile = File(...),
@@ -43,32 +88,7 @@ async def upload_single_file(
         TaskResponse: Task information
     """
     try:
-        # Validate file type
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(
-                status_code=400,
-                detail="Only PDF files are allowed"
-            )
-        
-        # Generate unique filename
-        file_id = str(uuid.uuid4())
-        safe_filename = f"{file_id}_{file.filename}"
-        file_path = upload_dir / safe_filename
-        
-        # Save file
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-        
-        # Create task
-        task_id = str(uuid.uuid4())
-        task_data = {
-            "task_id": task_id,
-            "file_name": file.filename,
-            "file_path": str(file_path),
-            "status": "pending",
-            "created_at": datetime.utcnow()
-        }
+        task_data = await save_upload(file)
         
         # Store task in MongoDB
         await task_manager.mongo_client[settings.MONGODB_DB_NAME].tasks.insert_one(task_data)
@@ -76,16 +96,17 @@ async def upload_single_file(
         # Start processing in background
         background_tasks.add_task(
             task_manager.process_pdf_task,
-            str(file_path),
-            task_id
+            task_data["file_path"],
+            task_data["task_id"]
         )
         
-        logger.info(f"Started processing task {task_id} for file {file.filename}")
+        logger.info(f"Started processing task {task_data['task_id']} for file {file.filename}")
         return TaskResponse(**task_data)
         
-    except Exception as e:
-        traceback.print_exc()
-        logger.error(f"Error processing upload: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error processing upload")
         raise HTTPException(
             status_code=500,
             detail="Error processing upload"
@@ -106,38 +127,60 @@ async def upload_multiple_files(
     Returns:
         List[TaskResponse]: List of task information
     """
-    responses = []
-    for file in files:
-        try:
-            response = await upload_single_file(file, background_tasks)
-            responses.append(response)
-        except HTTPException as e:
-            logger.warning(f"Skipping file {file.filename}: {str(e)}")
-            continue
-    
-    if not responses:
-        traceback.print_exc()
+    # Save all files concurrently
+    results = await asyncio.gather(
+        *(save_upload(file) for file in files),
+        return_exceptions=True
+    )
+    
+    tasks = []
+    for file, result in zip(files, results):
+        if isinstance(result, HTTPException):
+            logger.warning(f"Skipping file {file.filename}: {result.detail}")
+        elif isinstance(result, Exception):
+            logger.opt(exception=result).error(f"Skipping file {file.filename}: failed to save upload")
+        else:
+            tasks.append(result)
+    
+    if not tasks:
         raise HTTPException(
             status_code=400,
             detail="No valid files were uploaded"
         )
     
-    return responses
+    # Store every task in a single round trip
+    await task_manager.mongo_client[settings.MONGODB_DB_NAME].tasks.insert_many(tasks, ordered=False)
+    
+    for task_data in tasks:
+        background_tasks.add_task(
+            task_manager.process_pdf_task,
+            task_data["file_path"],
+            task_data["task_id"]
+        )
+        logger.info(f"Started processing task {task_data['task_id']} for file {task_data['file_name']}")
+    
+    return [TaskResponse(**task_data) for task_data in tasks]
 
 @router.get("/task/{task_id}", response_model=TaskResponse)
-async def get_task_status(task_id: str):
+async def get_task_status(
+    task_id: str,
+    wait: float = Query(0, ge=0, le=MAX_TASK_WAIT)
+):
     """
     Get the status of a processing task.
     
+    With wait set, the request is held until the task status changes or
+    wait seconds pass (long polling), so clients need not poll repeatedly.
+    
     Args:
         task_id: Task identifier
+        wait: Maximum time to wait for a status change in seconds
         
     Returns:
         TaskResponse: Task information
     """
-    task = await task_manager.mongo_client[settings.MONGODB_DB_NAME].tasks.find_one(
-        {"task_id": task_id}
-    )
+    tasks = task_manager.mongo_client[settings.MONGODB_DB_NAME].tasks
+    task = await tasks.find_one({"task_id": task_id})
     
     if not task:
         raise HTTPException(
@@ -145,4 +188,13 @@ async def get_task_status(task_id: str):
             detail="Task not found"
         )
     
-    return TaskResponse(**task) 
\ No newline at end of file
+    # Hold the request until the status changes or the wait runs out
+    status = task["status"]
+    deadline = time.monotonic() + wait
+    while status not in ("completed", "failed") and time.monotonic() < deadline:
+        await asyncio.sleep(TASK_WAIT_INTERVAL)
+        task = await tasks.find_one({"task_id": task_id}) or task
+        if task["status"] != status:
+            break
+    
+    return TaskResponse(**task)
@@ -17,25 +17,43 @@ class Settings(BaseSettings):
         MAX_WORKERS: Maximum number of worker threads for background tasks
         CHUNK_SIZE: Size of text chunks for document processing (in tokens)
         CHUNK_OVERLAP: Overlap between chunks (in tokens)
+        EMBEDDING_BATCH_SIZE: Number of chunks embedded per model inference batch
+        PDF_PROCESS_WORKERS: PDF extraction processes per server process (0 shares the CPUs between workers)
         
         # Database Settings
         MONGODB_URL: MongoDB connection URL
         MONGODB_DB_NAME: MongoDB database name
         
+        # Task Queue Settings
+        REDIS_URL: Redis connection URL
+        TASK_STREAM: Name of the Redis stream PDF tasks are queued on
+        TASK_CONSUMER_GROUP: Consumer group shared by every server process
+        TASK_STREAM_MAXLEN: Approximate number of entries the task stream is trimmed to
+        TASK_CLAIM_IDLE_MS: Idle time after which an unacknowledged task is reclaimed (in milliseconds)
+        PDF_CACHE_TTL: Lifetime of cached chunk IDs of a processed PDF (in seconds)
+        
         # Vector Store Settings
         QDRANT_URL: Qdrant server URL
         QDRANT_API_KEY: Qdrant API key
+        QDRANT_PREFER_GRPC: Whether to talk to Qdrant over gRPC instead of REST
         COLLECTION_NAME: Name of the vector collection
         
+        # Retrieval Cache Settings
+        SEARCH_CACHE_SIZE: Maximum number of cached similarity search queries
+        SEARCH_CACHE_TTL: Lifetime of a cached search result (in seconds)
+        SEARCH_CACHE_DEPTH: Number of results fetched and cached per query
+        
         # LLM Settings
         GROQ_API_KEY: Groq API key
         MODEL_NAME: Name of the Groq model to use
         MAX_CONTEXT_LENGTH: Maximum context length for the model
         TEMPERATURE: Temperature for LLM responses
+        SUMMARY_INTERVAL: Number of turns between rolling summary refreshes
         
         # PDF Processing
         OCR_ENABLED: Whether to enable OCR for images in PDFs
         PDF_UPLOAD_DIR: Directory to store uploaded PDFs
+        UPLOAD_CHUNK_SIZE: Size of the chunks uploads are copied to disk in (in bytes)
     """
     
     # Server Settings
@@ -48,16 +66,32 @@ class Settings(BaseSettings):
     CHUNK_SIZE: int = 512
     CHUNK_OVERLAP: int = 50 
     EMBEDDING_LENGTH: int = 768
+    EMBEDDING_BATCH_SIZE: int = 32
+    PDF_PROCESS_WORKERS: int = 0
     
     # Database Settings
     MONGODB_URL: str
     MONGODB_DB_NAME: str = "rag_system"
     
+    # Task Queue Settings
+    REDIS_URL: str = "redis://localhost:6379/0"
+    TASK_STREAM: str = "pdf_tasks"
+    TASK_CONSUMER_GROUP: str = "pdf_workers"
+    TASK_STREAM_MAXLEN: int = 10000
+    TASK_CLAIM_IDLE_MS: int = 30 * 60 * 1000
+    PDF_CACHE_TTL: int = 7 * 24 * 3600
+    
     # Vector Store Settings
     QDRANT_URL: str
     QDRANT_API_KEY: Optional[str] = None
+    QDRANT_PREFER_GRPC: bool = True
     COLLECTION_NAME: str = "documents"
     
+    # Retrieval Cache Settings
+    SEARCH_CACHE_SIZE: int = 2048
+    SEARCH_CACHE_TTL: int = 300
+    SEARCH_CACHE_DEPTH: int = 50
+    
     # LLM Settings
     TOP_K: int = 5 # 25
     TOP_K_RERANKER: int = 10
@@ -67,10 +101,12 @@ class Settings(BaseSettings):
     MODEL_NAME: str = "mixtral-8x7b-32768"  # Groq's Mixtral model
     MAX_CONTEXT_LENGTH: int = 8192  # 8k context window
     TEMPERATURE: float = 0.7
+    SUMMARY_INTERVAL: int = 3
     
     # PDF Processing
     OCR_ENABLED: bool = True
     PDF_UPLOAD_DIR: str = "uploads"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,121 @@
+import asyncio
+
+from loguru import logger
+
+# Redis key holding the limit shared by every server process, and the channel announcing changes
+ADMISSION_LIMIT_KEY = "admission:limit"
+ADMISSION_LIMIT_CHANNEL = "admission:limit"
+
+
+class AdmissionController:
+    """
+    Admission controller limiting the number of requests processed concurrently.
+
+    Unlike asyncio.Semaphore, the concurrency limit can be resized at runtime:
+    the in-flight counter and the limit are guarded by an asyncio.Condition, so
+    waiters simply re-check the predicate whenever either of them changes.
+
+    Each server process has its own controller; follow() keeps its limit in
+    sync with the one shared through Redis, so a resize applies to every
+    process.
+    """
+
+    def __init__(self, limit: int):
+        """
+        Initialize the admission controller.
+
+        Args:
+            limit: Maximum number of concurrently admitted requests
+        """
+        self.active = 0
+        self.limit = limit
+        self._cond = asyncio.Condition()
+        self._notify_tasks = set()
+
+    async def acquire(self):
+        """Wait until a slot is free, then take it."""
+        async with self._cond:
+            try:
+                await self._cond.wait_for(lambda: self.active < self.limit)
+            except asyncio.CancelledError:
+                # This waiter may have consumed a wakeup meant for a free slot; pass it on
+                self._cond.notify(1)
+                raise
+            self.active += 1
+
+    def release(self):
+        """
+        Free a slot and wake up one waiter.
+
+        The counter is decremented without awaiting, so a cancelled request
+        can never leak its slot; the waiter is notified from a separate task
+        once the condition lock is free.
+        """
+        self.active -= 1
+        task = asyncio.get_running_loop().create_task(self._notify(1))
+        self._notify_tasks.add(task)
+        task.add_done_callback(self._notify_tasks.discard)
+
+    async def _notify(self, n: int):
+        """Wake up n waiters so they re-check the predicate."""
+        async with self._cond:
+            self._cond.notify(n)
+
+    async def set_limit(self, limit: int):
+        """
+        Resize the concurrency limit without restarting the server.
+
+        Args:
+            limit: New maximum number of concurrently admitted requests
+        """
+        async with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+        logger.info(f"Admission limit set to {limit}")
+
+    async def follow(self, redis):
+        """
+        Apply the limit shared in Redis, now and whenever it is changed.
+
+        Runs until cancelled, resubscribing after connection errors.
+
+        Args:
+            redis: Async Redis client
+        """
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                # Subscribe first so a change made while reading the key is not missed
+                await pubsub.subscribe(ADMISSION_LIMIT_CHANNEL)
+                limit = await redis.get(ADMISSION_LIMIT_KEY)
+                if limit is not None:
+                    await self.set_limit(int(limit))
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self.set_limit(int(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Lost the shared admission limit, retrying: {str(e)}")
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+
+    @staticmethod
+    async def publish_limit(redis, limit: int):
+        """
+        Share a new limit with every server process.
+
+        Args:
+            redis: Async Redis client
+            limit: New maximum number of concurrently admitted requests per process
+        """
+        await redis.set(ADMISSION_LIMIT_KEY, limit)
+        await redis.publish(ADMISSION_LIMIT_CHANNEL, limit)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
@@ -1,21 +1,29 @@
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List
 from datetime import datetime
 import asyncio
-from collections import deque
+import hashlib
+import os
+import socket
 
-from tqdm import tqdm
+import orjson
 from loguru import logger
-from motor.motor_asyncio import AsyncIOMotorClient
-from qdrant_client import QdrantClient
+from pymongo import UpdateOne
+from redis.exceptions import ResponseError
 from qdrant_client.models import Distance, VectorParams
 
 from ..settings import get_settings
+from .clients import get_mongo, get_qdrant, get_redis
 from .pdf_processor import PDFProcessor
-from .vector_store import VectorStore
+from .vector_store import VectorStore, QUANTIZATION_CONFIG
 
 settings = get_settings()
 
+def _sha256_file(file_path: str) -> str:
+    """Compute the SHA-256 hex digest of a file with OpenSSL's accelerated implementation."""
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
 class BackgroundTaskManager:
     """
     Manages background tasks for PDF processing and vector storage.
@@ -24,26 +32,69 @@ class BackgroundTaskManager:
     1. PDF processing using PDFProcessor
     2. Vector storage in Qdrant with FastEmbed
     3. Task status tracking in MongoDB
-    4. Task queuing and concurrency control
+    4. Task queuing in a Redis stream shared by every server process
+    5. Caching of chunk IDs by PDF content hash
     """
     
+    STATUS_FLUSH_INTERVAL = 0.05
+    STATUS_RETRY_INTERVAL = 1.0
+    STATUS_FLUSH_TIMEOUT = 5.0
+    
     def __init__(self):
         """Initialize the background task manager."""
         self.pdf_processor = PDFProcessor()
-        self.mongo_client = AsyncIOMotorClient(settings.MONGODB_URL)
-        self.qdrant_client = QdrantClient(
-            url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY
-        )
+        self.mongo_client = get_mongo()
+        self.qdrant_client = get_qdrant()
         self.vector_store = VectorStore()
-        self.task_queue = deque()
-        self.processing_semaphore = asyncio.Semaphore(settings.MAX_WORKERS)
-        self.queue_processor_task = None
+        self.redis = get_redis()
+        self.consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self.workers = []
+        self._pending_status_updates: Dict[str, Dict[str, Any]] = {}
+        self._status_flush_task = None
         
         # Ensure vector collection exists
         self._init_vector_collection()
         logger.info("Initialized BackgroundTaskManager")
     
+    async def start(self):
+        """Create the task consumer group and start MAX_WORKERS stream consumers."""
+        if self.workers:
+            return
+        try:
+            await self.redis.xgroup_create(
+                settings.TASK_STREAM,
+                settings.TASK_CONSUMER_GROUP,
+                id="0",
+                mkstream=True
+            )
+        except ResponseError as e:
+            # Another server process already created the group
+            if "BUSYGROUP" not in str(e):
+                raise
+        self.workers = [
+            asyncio.create_task(self._worker(f"{self.consumer_prefix}-{i}"))
+            for i in range(settings.MAX_WORKERS)
+        ]
+        logger.info(f"Started {len(self.workers)} PDF processing workers")
+    
+    async def stop(self):
+        """Cancel the queue workers, write buffered task status updates and stop PDF processing."""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        await asyncio.to_thread(self.pdf_processor.shutdown)
+        
+        if self._status_flush_task is not None and not self._status_flush_task.done():
+            try:
+                await asyncio.wait_for(self._status_flush_task, self.STATUS_FLUSH_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.error(f"Dropped status updates of {len(self._pending_status_updates)} task(s) on shutdown")
+    
+    async def ensure_indexes(self):
+        """Create the index used by task status lookups."""
+        await self.mongo_client[settings.MONGODB_DB_NAME].tasks.create_index("task_id", unique=True)
+    
     def _init_vector_collection(self):
         """Initialize the vector collection in Qdrant if it doesn't exist."""
         try:
@@ -58,16 +109,26 @@ class BackgroundTaskManager:
                         collection_name=settings.COLLECTION_NAME,
                         vectors_config=VectorParams(
                             size=settings.EMBEDDING_LENGTH,
-                            distance=Distance.COSINE
-                        )
+                            distance=Distance.COSINE,
+                            on_disk=True
+                        ),
+                        quantization_config=QUANTIZATION_CONFIG
+                    )
+                elif collection_info.config.quantization_config is None:
+                    self.qdrant_client.update_collection(
+                        collection_name=settings.COLLECTION_NAME,
+                        quantization_config=QUANTIZATION_CONFIG
                     )
+                    logger.info(f"Enabled int8 quantization on vector collection: {settings.COLLECTION_NAME}")
             else:
                 self.qdrant_client.create_collection(
                     collection_name=settings.COLLECTION_NAME,
                     vectors_config=VectorParams(
                         size=settings.EMBEDDING_LENGTH,
-                        distance=Distance.COSINE
-                    )
+                        distance=Distance.COSINE,
+                        on_disk=True
+                    ),
+                    quantization_config=QUANTIZATION_CONFIG
                 )
                 logger.info(f"Created vector collection: {settings.COLLECTION_NAME}")
         except Exception as e:
@@ -82,24 +143,79 @@ class BackgroundTaskManager:
             file_path: Path to the PDF file
             task_id: Unique identifier for the task
         """
-        # Add task to queue
-        self.task_queue.append((file_path, task_id))
-        
-        # Start queue processor if not running
-        if self.queue_processor_task is None or self.queue_processor_task.done():
-            self.queue_processor_task = asyncio.create_task(self._process_queue())
-        
+        # Add task to the shared stream
+        await self.redis.xadd(
+            settings.TASK_STREAM,
+            {"file_path": file_path, "task_id": task_id},
+            maxlen=settings.TASK_STREAM_MAXLEN,
+            approximate=True
+        )
         logger.info(f"Added task {task_id} to queue for file {file_path}")
     
-    async def _process_queue(self):
-        """Process tasks from the queue with concurrency control."""
-        while self.task_queue:
-            async with self.processing_semaphore:
+    async def _worker(self, consumer: str):
+        """
+        Consume tasks from the stream one at a time, forever.
+        
+        Tasks left unacknowledged for TASK_CLAIM_IDLE_MS by a consumer that
+        died are claimed when no new task is waiting. A task is acknowledged
+        only once it completed or failed, never when its worker is cancelled.
+        
+        Args:
+            consumer: Name of this consumer in the group
+        """
+        while True:
+            try:
+                response = await self.redis.xreadgroup(
+                    settings.TASK_CONSUMER_GROUP,
+                    consumer,
+                    {settings.TASK_STREAM: ">"},
+                    count=1,
+                    block=5000
+                )
+                messages = response[0][1] if response else []
+                if not messages:
+                    _, messages, _ = await self.redis.xautoclaim(
+                        settings.TASK_STREAM,
+                        settings.TASK_CONSUMER_GROUP,
+                        consumer,
+                        min_idle_time=settings.TASK_CLAIM_IDLE_MS,
+                        count=1
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error reading from task stream")
+                await asyncio.sleep(1)
+                continue
+            
+            for message_id, fields in messages:
+                task_id = fields.get("task_id")
+                try:
+                    await self._process_single_task(fields["file_path"], task_id)
+                except asyncio.CancelledError:
+                    # Leave the task pending so another consumer reclaims it
+                    raise
+                except Exception:
+                    logger.exception(f"Error processing task {task_id} from queue")
                 try:
-                    file_path, task_id = self.task_queue.popleft()
-                    await self._process_single_task(file_path, task_id)
-                except Exception as e:
-                    logger.error(f"Error processing task from queue: {str(e)}")
+                    await self.redis.xack(settings.TASK_STREAM, settings.TASK_CONSUMER_GROUP, message_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception(f"Error acknowledging task {task_id}")
+    
+    async def _get_cached_chunks(self, digest: str) -> Dict[str, Any] | None:
+        """Get the cached result of a previously processed PDF with the same content."""
+        cached = await self.redis.get(f"pdf:{digest}")
+        return orjson.loads(cached) if cached else None
+    
+    async def _cache_chunks(self, digest: str, chunk_ids: List[str], num_pages: int):
+        """Cache the chunk IDs of a processed PDF by content hash."""
+        await self.redis.set(
+            f"pdf:{digest}",
+            orjson.dumps({"chunk_ids": chunk_ids, "num_pages": num_pages}),
+            ex=settings.PDF_CACHE_TTL
+        )
     
     async def _process_single_task(self, file_path: str, task_id: str):
         """Process a single PDF task."""
@@ -107,6 +223,23 @@ class BackgroundTaskManager:
             # Update task status
             await self._update_task_status(task_id, "processing")
             
+            # Reuse the chunks of an identical, already processed PDF
+            digest = await asyncio.to_thread(_sha256_file, file_path)
+            cached = await self._get_cached_chunks(digest)
+            if cached:
+                result = {
+                    "status": "completed",
+                    "file_path": file_path,
+                    "html_paths": [],
+                    "chunk_ids": cached["chunk_ids"],
+                    "num_pages": cached["num_pages"],
+                    "num_chunks": len(cached["chunk_ids"]),
+                    "completed_at": datetime.utcnow()
+                }
+                await self._update_task_status(task_id, "completed", result)
+                logger.info(f"Completed task {task_id} from cache with {len(cached['chunk_ids'])} chunks")
+                return
+            
             # Process PDF
             documents = await self.pdf_processor.process_pdf(file_path)
             
@@ -115,19 +248,16 @@ class BackgroundTaskManager:
             output_dir.mkdir(exist_ok=True)
             
             html_paths = []
-            chunk_ids = []
             
-            for document in tqdm(documents, desc="Processing Document"):
-                # Extract text and metadata
-                content = document["text"]
-                metadata = {k: v for k, v in document.items() if k != "text"}
-                
-                # Store in vector store
-                ids = await self.vector_store.add_texts(
-                    texts=[content],
-                    metadatas=[metadata]
-                )
-                chunk_ids.extend(ids)
+            # Split off the text; what remains of each chunk is its metadata
+            texts = [document.pop("text") for document in documents]
+            metadatas = documents
+            
+            # Store in vector store, embedding every chunk of the PDF in one batch
+            chunk_ids = await self.vector_store.add_texts(
+                texts=texts,
+                metadatas=metadatas
+            )
             
             # Store results
             result = {
@@ -141,6 +271,7 @@ class BackgroundTaskManager:
             }
             
             await self._update_task_status(task_id, "completed", result)
+            await self._cache_chunks(digest, chunk_ids, len(documents))
             logger.info(f"Completed task {task_id} with {len(chunk_ids)} chunks")
             
         except Exception as e:
@@ -157,6 +288,9 @@ class BackgroundTaskManager:
         """
         Update task status in MongoDB.
         
+        Updates are buffered for STATUS_FLUSH_INTERVAL seconds and written
+        with a single bulk_write; updates of the same task are merged.
+        
         Args:
             task_id: Task identifier
             status: Current status
@@ -169,7 +303,33 @@ class BackgroundTaskManager:
         if result:
             update_data.update(result)
         
-        await self.mongo_client[settings.MONGODB_DB_NAME].tasks.update_one(
-            {"task_id": task_id},
-            {"$set": update_data}
-        ) 
\ No newline at end of file
+        # Coalesce with other pending updates of the same task
+        self._pending_status_updates.setdefault(task_id, {}).update(update_data)
+        if self._status_flush_task is None or self._status_flush_task.done():
+            self._status_flush_task = asyncio.create_task(self._flush_task_statuses())
+    
+    async def _flush_task_statuses(self):
+        """
+        Write pending task status updates to MongoDB in batches.
+        
+        A batch that fails to write is queued again, beneath any newer
+        updates of the same tasks, and retried after STATUS_RETRY_INTERVAL.
+        """
+        delay = self.STATUS_FLUSH_INTERVAL
+        while self._pending_status_updates:
+            await asyncio.sleep(delay)
+            updates, self._pending_status_updates = self._pending_status_updates, {}
+            try:
+                await self.mongo_client[settings.MONGODB_DB_NAME].tasks.bulk_write(
+                    [UpdateOne({"task_id": task_id}, {"$set": fields}) for task_id, fields in updates.items()],
+                    ordered=False
+                )
+                delay = self.STATUS_FLUSH_INTERVAL
+            except Exception:
+                logger.exception(f"Error updating status of {len(updates)} task(s), retrying")
+                for task_id, fields in updates.items():
+                    self._pending_status_updates[task_id] = {
+                        **fields,
+                        **self._pending_status_updates.get(task_id, {})
+                    }
+                delay = self.STATUS_RETRY_INTERVAL 
\ No newline at end of file
@@ -0,0 +1,61 @@
+from functools import lru_cache
+
+import httpx
+from loguru import logger
+from fastembed import TextEmbedding
+from fastembed.rerank.cross_encoder import TextCrossEncoder
+from motor.motor_asyncio import AsyncIOMotorClient
+from qdrant_client import QdrantClient
+from redis.asyncio import Redis
+
+from ..settings import get_settings
+
+settings = get_settings()
+
+@lru_cache
+def get_qdrant() -> QdrantClient:
+    """Get the process-wide Qdrant client."""
+    logger.info("Creating Qdrant client")
+    return QdrantClient(
+        url=settings.QDRANT_URL,
+        api_key=settings.QDRANT_API_KEY,
+        prefer_grpc=settings.QDRANT_PREFER_GRPC,
+        limits=httpx.Limits(
+            max_connections=settings.MAX_WORKERS * 2,
+            max_keepalive_connections=settings.MAX_WORKERS
+        )
+    )
+
+@lru_cache
+def get_mongo() -> AsyncIOMotorClient:
+    """Get the process-wide MongoDB client."""
+    logger.info("Creating MongoDB client")
+    return AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        maxPoolSize=max(settings.MAX_WORKERS * 2, 50),
+        minPoolSize=5,
+        waitQueueTimeoutMS=5000
+    )
+
+@lru_cache
+def get_redis() -> Redis:
+    """Get the process-wide Redis client."""
+    logger.info("Creating Redis client")
+    return Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+@lru_cache
+def get_embedder() -> TextEmbedding:
+    """Get the process-wide FastEmbed embedding model."""
+    logger.info("Loading embedding model")
+    return TextEmbedding(
+        model_name="nomic-ai/nomic-embed-text-v1.5",
+        max_length=settings.EMBEDDING_LENGTH
+    )
+
+@lru_cache
+def get_reranker() -> TextCrossEncoder:
+    """Get the process-wide FastEmbed reranker."""
+    logger.info("Loading reranker model")
+    return TextCrossEncoder(
+        model_name="Xenova/ms-marco-MiniLM-L-12-v2"
+    )
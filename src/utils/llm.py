@@ -1,11 +1,32 @@
 from typing import List, Dict
+from functools import lru_cache
 from loguru import logger
 import groq
+import httpx
+import tiktoken
 
 from ..settings import get_settings
 
 settings = get_settings()
 
+@lru_cache(maxsize=1)
+def _get_encoding() -> tiktoken.Encoding:
+    """Load the tokenizer used to size prompts once per process."""
+    return tiktoken.get_encoding("cl100k_base")
+
+def _estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Count the tokens in the content of a list of chat messages.
+    
+    Args:
+        messages: List of message dictionaries with 'role' and 'content'
+        
+    Returns:
+        int: Number of content tokens
+    """
+    encoded = _get_encoding().encode_batch([m["content"] for m in messages], disallowed_special=())
+    return sum(len(tokens) for tokens in encoded)
+
 class GroqLLM:
     """
     Utility class for interacting with Groq's LLM API.
@@ -14,7 +35,15 @@ class GroqLLM:
     
     def __init__(self):
         """Initialize the Groq client."""
-        self.client = groq.AsyncGroq(api_key=settings.GROQ_API_KEY)
+        self.client = groq.AsyncGroq(
+            api_key=settings.GROQ_API_KEY,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.MAX_WORKERS * 2,
+                    max_keepalive_connections=settings.MAX_WORKERS
+                )
+            )
+        )
         self.model = settings.MODEL_NAME
         logger.info(f"Initialized GroqLLM with model: {self.model}")
     
@@ -36,9 +65,8 @@ class GroqLLM:
             str: Generated response text
         """
         try:
-            # Calculate approximate token count
-            total_chars = sum(len(m["content"]) for m in messages)
-            approx_tokens = total_chars // 4  # Rough estimate
+            # Count prompt tokens
+            approx_tokens = _estimate_tokens(messages)
             
             # Ensure we don't exceed context window
             if max_tokens is None:
@@ -82,9 +110,8 @@ class GroqLLM:
             str: Generated response text chunks
         """
         try:
-            # Calculate approximate token count
-            total_chars = sum(len(m["content"]) for m in messages)
-            approx_tokens = total_chars // 4  # Rough estimate
+            # Count prompt tokens
+            approx_tokens = _estimate_tokens(messages)
             
             # Ensure we don't exceed context window
             if max_tokens is None:
@@ -102,10 +129,12 @@ class GroqLLM:
                 stream=True
             )
             
-            # Yield response chunks
-            async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            # Yield response chunks; closing the stream releases the pooled connection
+            # even when the consumer stops early
+            async with stream:
+                async for chunk in stream:
+                    if chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
                     
         except Exception as e:
             logger.error(f"Error generating streaming chat completion: {str(e)}")
@@ -1,15 +1,87 @@
 from typing import List, Dict, Any
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from PyPDF2 import PdfReader
+import os
+import re
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pypdfium2 as pdfium
 from loguru import logger
 
 from ..settings import get_settings
 from .text_chunking import chunk_text_recursive
-from .vector_store import VectorStore
 
 settings = get_settings()
 
+def _process_pool_size() -> int:
+    """
+    Number of PDF extraction processes for this server process.
+    
+    Production runs MAX_WORKERS uvicorn workers, each with its own pool,
+    so the CPUs are shared between them unless PDF_PROCESS_WORKERS is set.
+    """
+    if settings.PDF_PROCESS_WORKERS:
+        return settings.PDF_PROCESS_WORKERS
+    return max(1, (os.cpu_count() or 1) // settings.MAX_WORKERS)
+
+# Collapses whitespace around line breaks: strips lines and drops empty ones
+_LINE_BREAK_PATTERN = re.compile(r"\s*\n\s*")
+
+def _count_pages(pdf_path: str) -> int:
+    """Return the number of pages in a PDF."""
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def _extract_page_chunks(
+    pdf_path: str,
+    index: int,
+    total_pages: int,
+    chunk_size: int,
+    chunk_overlap: int
+) -> List[Dict[str, Any]]:
+    """
+    Extract and chunk the text of a single PDF page.
+    
+    Runs in a worker process, so it opens the document itself and returns
+    the finished chunks in one hop.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        index: Zero-based page index
+        total_pages: Number of pages in the PDF
+        chunk_size: Maximum size of each chunk
+        chunk_overlap: Overlap between consecutive chunks
+        
+    Returns:
+        List[Dict[str, Any]]: Chunks of the page with metadata, empty for blank pages
+    """
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        page = pdf[index]
+        textpage = page.get_textpage()
+        text = textpage.get_text_range()
+        textpage.close()
+        page.close()
+    finally:
+        pdf.close()
+    
+    text = _LINE_BREAK_PATTERN.sub("\n", text).strip()
+    if not text:
+        return []
+    
+    return chunk_text_recursive(
+        text,
+        chunk_size,
+        chunk_overlap,
+        {
+            "file_path": pdf_path,
+            "page_number": index + 1,
+            "total_pages": total_pages
+        }
+    )
+
 class PDFProcessor:
     """
     PDF processor that extracts text directly from PDFs.
@@ -23,10 +95,21 @@ class PDFProcessor:
     def __init__(self):
         """Initialize the PDF processor."""
         self.executor = ThreadPoolExecutor(max_workers=settings.MAX_WORKERS)
-        self.vector_store = VectorStore()
+        # Spawn rather than fork: the server process already runs gRPC and worker threads
+        self.process_pool = ProcessPoolExecutor(
+            max_workers=_process_pool_size(),
+            mp_context=get_context("spawn")
+        )
         self.semaphore = asyncio.Semaphore(settings.MAX_WORKERS)
+        self._chunk_size = settings.CHUNK_SIZE
+        self._chunk_overlap = settings.CHUNK_OVERLAP
         logger.info(f"Initialized PDFProcessor with {settings.MAX_WORKERS} workers")
     
+    def shutdown(self):
+        """Stop the extraction processes and threads."""
+        self.process_pool.shutdown(cancel_futures=True)
+        self.executor.shutdown(cancel_futures=True)
+    
     async def process_pdf(self, pdf_path: str) -> List[Dict[str, Any]]:
         """
         Process a PDF file asynchronously.
@@ -39,30 +122,26 @@ class PDFProcessor:
         """
         try:
             async with self.semaphore:  # Limit concurrent processing
-                # Extract text from PDF pages
-                pages = await self._extract_text_from_pdf(pdf_path)
-                
-                # Process chunks in batches
-                all_chunks = []
-                chunk_tasks = []
-                
-                for page_num, page_text in enumerate(pages, 1):
-                    if not page_text.strip():
-                        continue
-                    
-                    # Create chunk processing task
-                    task = asyncio.create_task(self._process_page(
-                        page_text=page_text,
-                        page_num=page_num,
-                        total_pages=len(pages),
-                        pdf_path=pdf_path
-                    ))
-                    chunk_tasks.append(task)
+                loop = asyncio.get_running_loop()
+                process_pool = self.process_pool
+                chunk_size = self._chunk_size
+                chunk_overlap = self._chunk_overlap
+                total_pages = await loop.run_in_executor(self.executor, _count_pages, pdf_path)
                 
-                # Wait for all chunk processing to complete
-                chunk_results = await asyncio.gather(*chunk_tasks)
-                for chunks in chunk_results:
-                    all_chunks.extend(chunks)
+                # Extract and chunk every page in the process pool
+                page_chunks = await asyncio.gather(*(
+                    loop.run_in_executor(
+                        process_pool,
+                        _extract_page_chunks,
+                        pdf_path,
+                        index,
+                        total_pages,
+                        chunk_size,
+                        chunk_overlap
+                    )
+                    for index in range(total_pages)
+                ))
+                all_chunks = [chunk for chunks in page_chunks for chunk in chunks]
                 
                 logger.info(f"Successfully processed PDF: {pdf_path} into {len(all_chunks)} chunks")
                 return all_chunks
@@ -71,67 +150,6 @@ class PDFProcessor:
             logger.error(f"Error processing PDF {pdf_path}: {str(e)}")
             raise
     
-    async def _process_page(
-        self,
-        page_text: str,
-        page_num: int,
-        total_pages: int,
-        pdf_path: str
-    ) -> List[Dict[str, Any]]:
-        """Process a single page of text asynchronously."""
-        try:
-            # Run chunking in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            chunks = await loop.run_in_executor(
-                self.executor,
-                chunk_text_recursive,
-                page_text,
-                settings.CHUNK_SIZE,
-                settings.CHUNK_OVERLAP,
-                {
-                    "file_path": pdf_path,
-                    "page_number": page_num,
-                    "total_pages": total_pages
-                }
-            )
-            return chunks
-            
-        except Exception as e:
-            logger.error(f"Error processing page {page_num}: {str(e)}")
-            raise
-    
-    async def _extract_text_from_pdf(self, pdf_path: str) -> List[str]:
-        """
-        Extract text from each page of the PDF.
-        
-        Args:
-            pdf_path: Path to the PDF file
-            
-        Returns:
-            List[str]: List of text content from each page
-        """
-        def _extract():
-            try:
-                reader = PdfReader(pdf_path)
-                pages = []
-                for page in reader.pages:
-                    text = page.extract_text()
-                    text = text.strip()
-                    text = '\n'.join(line.strip() for line in text.splitlines() if line.strip())
-                    pages.append(text)
-                
-                logger.info(f"Extracted text from {len(pages)} pages in {pdf_path}")
-                return pages
-                
-            except Exception as e:
-                logger.error(f"Error extracting text from PDF {pdf_path}: {str(e)}")
-                raise
-        
-        # Run extraction in thread pool
-        return await asyncio.get_event_loop().run_in_executor(
-            self.executor, _extract
-        )
-    
     def get_text_statistics(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Get statistics about the processed text.
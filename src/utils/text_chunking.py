@@ -1,6 +1,41 @@
 from typing import List, Dict, Any
+from functools import lru_cache
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from loguru import logger
+from tokenizers import Tokenizer
+
+# Tokenizer of the embedding model, so chunk sizes match what gets embedded
+TOKENIZER_NAME = "nomic-ai/nomic-embed-text-v1.5"
+
+@lru_cache(maxsize=1)
+def _get_tokenizer() -> Tokenizer:
+    """Load the embedding model tokenizer once per process."""
+    tokenizer = Tokenizer.from_pretrained(TOKENIZER_NAME)
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+    return tokenizer
+
+def count_tokens(text: str) -> int:
+    """
+    Count the embedding model tokens in a text.
+    
+    Args:
+        text: Text to measure
+        
+    Returns:
+        int: Number of tokens, excluding special tokens
+    """
+    return len(_get_tokenizer().encode(text, add_special_tokens=False).ids)
+
+@lru_cache(maxsize=8)
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """Get a shared recursive splitter for the given chunk size and overlap."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=count_tokens,
+        separators=["\n\n", "\n"]
+    )
 
 def chunk_text_recursive(
     text: str,
@@ -14,21 +49,16 @@ def chunk_text_recursive(
     
     Args:
         text: Text to split
-        chunk_size: Maximum size of each chunk
-        chunk_overlap: Number of characters to overlap between chunks
+        chunk_size: Maximum size of each chunk (in tokens)
+        chunk_overlap: Number of tokens to overlap between chunks
         metadata: Optional metadata to attach to each chunk
         
     Returns:
         List of dictionaries containing chunk text and metadata
     """
     try:
-        # Initialize the recursive splitter
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n"]
-        )
+        # Reuse the recursive splitter
+        splitter = _get_splitter(chunk_size, chunk_overlap)
         
         # Split the text
         chunks = splitter.split_text(text)
@@ -1,16 +1,88 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+import asyncio
+from collections import OrderedDict
+from functools import cached_property
+import time
 import uuid
 
+import numpy as np
 from loguru import logger
 from fastembed import TextEmbedding
-from qdrant_client import QdrantClient
 from fastembed.rerank.cross_encoder import TextCrossEncoder
-from qdrant_client.http.models import PointStruct, Distance, VectorParams
+from qdrant_client.http.models import (
+    Distance,
+    VectorParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    QuantizationSearchParams
+)
 
 from ..settings import get_settings
+from .clients import get_qdrant, get_embedder, get_reranker, get_redis
 
 settings = get_settings()
 
+class SearchCache:
+    """
+    LRU cache with per-entry expiry for similarity search results.
+    
+    Shared by every VectorStore in the process. Keys include the search
+    index version kept in Redis, which ingestion in any server process
+    increments, so results cached before a document was added are never
+    served again.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Tuple, Tuple[float, List[Dict[str, Any]]]] = OrderedDict()
+    
+    def get(self, key: Tuple) -> List[Dict[str, Any]] | None:
+        """Return the cached results for a key, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, docs = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return docs
+    
+    def put(self, key: Tuple, docs: List[Dict[str, Any]]):
+        """Cache results for a key, evicting the least recently used entry."""
+        self._entries[key] = (time.monotonic() + self.ttl, docs)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop every cached result."""
+        self._entries.clear()
+
+search_cache = SearchCache(settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL)
+
+# Redis key counting ingestions into the collection, across every process
+SEARCH_VERSION_KEY = "search:version"
+
+# Keep int8 vectors in RAM for search and the original float32 vectors on disk
+QUANTIZATION_CONFIG = ScalarQuantization(
+    scalar=ScalarQuantizationConfig(
+        type=ScalarType.INT8,
+        always_ram=True
+    )
+)
+
+# Search the int8 vectors, then rescore the best candidates with the originals
+SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(
+        rescore=True,
+        oversampling=2.0
+    )
+)
+
 class VectorStore:
     """
     Vector store utility using FastEmbed and Qdrant.
@@ -20,27 +92,23 @@ class VectorStore:
     def __init__(self):
         """Initialize the vector store with FastEmbed and Qdrant."""
 
-        # Initialize Reranker
-        self.reranker = TextCrossEncoder(
-            model_name="Xenova/ms-marco-MiniLM-L-12-v2"
-        )
-
-        # Initialize FastEmbed
-        self.embedding_model = TextEmbedding(
-            model_name="nomic-ai/nomic-embed-text-v1.5",
-            max_length=settings.EMBEDDING_LENGTH
-        )
-        
-        # Initialize Qdrant client
-        self.qdrant = QdrantClient(
-            url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY
-        )
+        # Shared client; models are loaded on first use
+        self.qdrant = get_qdrant()
         
         # Ensure collection exists
         self._init_collection()
         logger.info("Initialized VectorStore")
     
+    @cached_property
+    def reranker(self) -> TextCrossEncoder:
+        """Reranker, loaded on first use since ingestion never needs it."""
+        return get_reranker()
+    
+    @cached_property
+    def embedding_model(self) -> TextEmbedding:
+        """Embedding model, loaded on first use."""
+        return get_embedder()
+    
     def _init_collection(self):
         """Initialize the vector collection if it doesn't exist."""
         try:
@@ -50,14 +118,48 @@ class VectorStore:
                     collection_name=settings.COLLECTION_NAME,
                     vectors_config=VectorParams(
                         size=settings.EMBEDDING_LENGTH,
-                        distance=Distance.COSINE
-                    )
+                        distance=Distance.COSINE,
+                        on_disk=True
+                    ),
+                    quantization_config=QUANTIZATION_CONFIG
                 )
                 logger.info(f"Created vector collection: {settings.COLLECTION_NAME}")
+            elif self.qdrant.get_collection(settings.COLLECTION_NAME).config.quantization_config is None:
+                self.qdrant.update_collection(
+                    collection_name=settings.COLLECTION_NAME,
+                    quantization_config=QUANTIZATION_CONFIG
+                )
+                logger.info(f"Enabled int8 quantization on vector collection: {settings.COLLECTION_NAME}")
         except Exception as e:
             logger.error(f"Error initializing vector collection: {str(e)}")
             raise
     
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a single float32 matrix (blocking)."""
+        return np.stack(list(self.embedding_model.embed(texts, batch_size=settings.EMBEDDING_BATCH_SIZE)))
+    
+    def _search(self, query: str, limit: int, filter: Dict[str, Any] = None) -> List[Any]:
+        """Embed a query and search the collection with it (blocking)."""
+        query_embedding = next(iter(self.embedding_model.embed([query])))
+        return self.qdrant.search(
+            collection_name=settings.COLLECTION_NAME,
+            query_vector=query_embedding,
+            limit=limit,
+            query_filter=filter,
+            search_params=SEARCH_PARAMS
+        )
+    
+    def _upload(self, vectors: np.ndarray, payloads: List[Dict[str, Any]], ids: List[str]):
+        """Upload vectors with their payloads to the collection (blocking)."""
+        self.qdrant.upload_collection(
+            collection_name=settings.COLLECTION_NAME,
+            vectors=vectors,
+            payload=payloads,
+            ids=ids,
+            batch_size=256,
+            wait=True
+        )
+    
     async def add_texts(
         self,
         texts: List[str],
@@ -73,28 +175,39 @@ class VectorStore:
         Returns:
             List of IDs for the added texts
         """
-        if not self.qdrant.collection_exists(collection_name=settings.COLLECTION_NAME):
-            self._init_collection()
+        # Nothing to embed, e.g. a scanned PDF without extractable text
+        if not texts:
+            return []
+        
         try:
-            points = []
-            embeddings = list(self.embedding_model.embed(texts))
+            # Keep embeddings as one dense float32 matrix instead of Python lists
+            vectors = await asyncio.to_thread(self._embed, texts)
             ids = [str(uuid.uuid4()) for _ in texts]
-            for i, (text, embedding) in enumerate(zip(texts, embeddings)):
-                point = PointStruct(
-                    id=ids[i],
-                    vector=embedding.tolist(),
-                    payload={
-                        "text": text,
-                        **(metadatas[i] if metadatas else {})
-                    }
-                )
-                points.append(point)
+            payloads = [
+                {
+                    "text": text,
+                    **(metadatas[i] if metadatas else {})
+                }
+                for i, text in enumerate(texts)
+            ]
             
-            # Upload to Qdrant
-            self.qdrant.upsert(
-                collection_name=settings.COLLECTION_NAME,
-                points=points
-            )
+            # Upload to Qdrant in large batches rather than one request per call
+            try:
+                await asyncio.to_thread(self._upload, vectors, payloads, ids)
+            except Exception:
+                # The collection exists since startup unless it was dropped; recreate it once
+                if await asyncio.to_thread(self.qdrant.collection_exists, collection_name=settings.COLLECTION_NAME):
+                    raise
+                logger.warning(f"Vector collection {settings.COLLECTION_NAME} is missing, recreating it")
+                await asyncio.to_thread(self._init_collection)
+                await asyncio.to_thread(self._upload, vectors, payloads, ids)
+            
+            # New documents can change the answer to any cached query, in any process
+            search_cache.clear()
+            try:
+                await get_redis().incr(SEARCH_VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"Error bumping search index version: {str(e)}")
             
             logger.info(f"Added {len(texts)} texts to vector store")
             return ids
@@ -112,6 +225,11 @@ class VectorStore:
         """
         Search for similar texts in the vector store.
         
+        Unfiltered searches fetch SEARCH_CACHE_DEPTH results and cache them
+        keyed by the search index version and the normalized query, so
+        repeated questions are answered without embedding or querying
+        Qdrant, whatever the requested k.
+        
         Args:
             query: Query text
             k: Number of results to return
@@ -120,17 +238,24 @@ class VectorStore:
         Returns:
             List of similar documents with scores
         """
+        cache_key = None
+        limit = k
+        if filter is None and k <= settings.SEARCH_CACHE_DEPTH:
+            try:
+                version = await get_redis().get(SEARCH_VERSION_KEY)
+            except Exception as e:
+                # Without the version the cache cannot be trusted; search uncached
+                logger.warning(f"Error reading search index version: {str(e)}")
+            else:
+                cache_key = (version, query.strip().lower())
+                cached = search_cache.get(cache_key)
+                if cached is not None:
+                    return cached[:k]
+                limit = settings.SEARCH_CACHE_DEPTH
+        
         try:
-            # Generate query embedding
-            query_embedding = list(self.embedding_model.embed([query]))[0]
-            
-            # Search in Qdrant
-            results = self.qdrant.search(
-                collection_name=settings.COLLECTION_NAME,
-                query_vector=query_embedding.tolist(),
-                limit=k,
-                query_filter=filter
-            )
+            # Embed the query and search Qdrant off the event loop
+            results = await asyncio.to_thread(self._search, query, limit, filter)
             
             # Format results
             docs = []
@@ -144,7 +269,9 @@ class VectorStore:
 
             # Re Ranking Document
             
-            return docs
+            if cache_key is not None:
+                search_cache.put(cache_key, docs)
+            return docs[:k]
             
         except Exception as e:
             logger.error(f"Error searching vector store: {str(e)}")
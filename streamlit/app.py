@@ -1,8 +1,19 @@
 import streamlit as st
-import httpx
-import os
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+import asyncio
+import orjson
+from typing import Dict, List, Any, Optional, Tuple
+
+from utils import (
+    Endpoints,
+    get_http_client,
+    get_async_client,
+    run_async,
+    parse_json,
+    report_error,
+    flush_errors,
+    upload_document,
+    format_timestamp
+)
 
 # Configure the app
 st.set_page_config(
@@ -12,10 +23,6 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Constants
-API_URL = os.getenv("API_URL", "http://localhost:8000")
-API_PREFIX = "/api/v1"
-
 # State management
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -23,73 +30,97 @@ if "messages" not in st.session_state:
 if "conversation_id" not in st.session_state:
     st.session_state.conversation_id = None
 
+if "current_conversation" not in st.session_state:
+    st.session_state.current_conversation = None
+
+if "conv_page" not in st.session_state:
+    st.session_state.conv_page = 0
+
+# Create the shared async client at start-up; it warms up its connection off the critical path
+get_async_client()
+
+# Number of conversations listed per sidebar page
+CONVERSATIONS_PER_PAGE = 20
+
+# Number of most recent messages rendered by default
+RECENT_MESSAGES = 50
 
-def get_api_url(endpoint: str) -> str:
-    """Get the full API URL for an endpoint."""
-    return f"{API_URL}{API_PREFIX}{endpoint}"
+
+async def _fetch_sidebar_data(client, conversation_id: Optional[str], page: int) -> list:
+    """Request a page of the conversation list and the active conversation concurrently."""
+    requests = [client.get(
+        Endpoints.CONVERSATIONS,
+        params={"skip": page * CONVERSATIONS_PER_PAGE, "limit": CONVERSATIONS_PER_PAGE}
+    )]
+    if conversation_id:
+        requests.append(client.get(Endpoints.conversation(conversation_id)))
+    return await asyncio.gather(*requests, return_exceptions=True)
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def load_sidebar_data(conversation_id: Optional[str], page: int = 0) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Load a page of conversations and the active conversation in one round trip.
+    
+    Results are cached for 30 seconds, so reruns while typing or clicking
+    do not hit the API. Failures raise and are therefore never cached.
+    """
+    # Resolve the cached client here: the event loop thread has no script run context
+    client = get_async_client()
+    responses = run_async(_fetch_sidebar_data(client, conversation_id, page))
+    for response in responses:
+        if isinstance(response, Exception):
+            raise response
+        response.raise_for_status()
+    
+    conversations = parse_json(responses[0])
+    conversation = parse_json(responses[1]) if conversation_id else {}
+    return conversations, conversation
 
 
-def load_conversations() -> List[Dict[str, Any]]:
-    """Load all conversations from the API."""
+def fetch_sidebar_data(conversation_id: Optional[str], page: int = 0) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Load the sidebar data, reporting failures in the UI."""
     try:
-        response = httpx.get(get_api_url("/chat/conversations"))
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Failed to load conversations: {response.text}")
-            return []
-    except Exception as _:
-        return []
+        return load_sidebar_data(conversation_id, page)
+    except Exception as e:
+        report_error(f"Failed to load conversations: {str(e)}")
+        return [], {}
 
 
 def create_conversation() -> Optional[str]:
     """Create a new conversation and return its ID."""
     try:
-        response = httpx.put(get_api_url("/chat/conversation"))
+        response = get_http_client().put(Endpoints.NEW_CONVERSATION)
         if response.status_code == 200:
-            return response.json()["id"]
+            load_sidebar_data.clear()
+            return parse_json(response)["id"]
         else:
-            st.error(f"Failed to create conversation: {response.text}")
+            report_error(f"Failed to create conversation: {response.text}")
             return None
     except Exception as e:
-        st.error(f"Error creating conversation: {str(e)}")
+        report_error(f"Error creating conversation: {str(e)}")
         return None
 
 
 def get_conversation(conversation_id: str) -> Dict[str, Any]:
     """Get a conversation by ID."""
     try:
-        response = httpx.get(get_api_url(f"/chat/conversations/{conversation_id}"))
+        response = get_http_client().get(Endpoints.conversation(conversation_id))
         if response.status_code == 200:
-            return response.json()
+            return parse_json(response)
         else:
-            st.error(f"Failed to get conversation: {response.text}")
+            report_error(f"Failed to get conversation: {response.text}")
             return {}
     except Exception as _:
         return {}
 
 
-def upload_document(file) -> bool:
-    """Upload a document to the API."""
-    try:
-        files = {"file": (file.name, file.getvalue(), "application/pdf")}
-        response = httpx.post(get_api_url("/documents/upload"), files=files)
-        if response.status_code == 200:
-            return True
-        else:
-            st.error(f"Failed to upload document: {response.text}")
-            return False
-    except Exception as e:
-        st.error(f"Error uploading document: {str(e)}")
-        return False
-
-
 def get_task_status(task_id: str) -> Dict[str, Any]:
     """Get the status of a document processing task."""
     try:
-        response = httpx.get(get_api_url(f"/documents/task/{task_id}"))
+        response = get_http_client().get(Endpoints.task(task_id))
         if response.status_code == 200:
-            return response.json()
+            return parse_json(response)
         else:
             return {"status": "failed"}
     except Exception:
@@ -99,25 +130,29 @@ def get_task_status(task_id: str) -> Dict[str, Any]:
 def submit_feedback(conversation_id: str, message_index: int, thumbs: str, comment: str | None = None) -> bool:
     """Submit feedback for a message."""
     try:
-        response = httpx.post(
-            get_api_url(f"/chat/{conversation_id}/messages/{message_index}/feedback"),
+        response = get_http_client().post(
+            Endpoints.feedback(conversation_id, message_index),
             json={"thumbs": thumbs, "comment": comment},
             timeout=10.0
         )
         return response.status_code == 200
     except Exception as e:
-        st.error(f"Error submitting feedback: {str(e)}")
+        report_error(f"Error submitting feedback: {str(e)}")
         return False
 
 
+# Roles rendered as plain chat bubbles, without feedback widgets
+_PLAIN_ROLES = frozenset({"user", "system"})
+
+
 def format_message(msg: Dict[str, Any], message_index: int) -> None:
     """Format and display a message in the chat UI."""
     role = msg.get("role", "")
     content = msg.get("content", "")
     feedback = msg.get("feedback", {})
     
-    if role == "user":
-        st.chat_message("user").write(content)
+    if role in _PLAIN_ROLES:
+        st.chat_message(role).write(content)
     elif role == "assistant":
         with st.chat_message("assistant"):
             st.write(content)
@@ -154,39 +189,77 @@ def format_message(msg: Dict[str, Any], message_index: int) -> None:
                 st.caption(f"Feedback: {feedback_icon}")
                 if feedback.get("comment"):
                     st.caption(f"Comment: {feedback['comment']}")
-    
-    elif role == "system":
-        st.chat_message("system").write(content)
 
 
-def send_message(conversation_id: str, message: str) -> Optional[Dict[str, Any]]:
-    """Send a message to the chat API and return the response."""
+def stream_message(conversation_id: str, message: str, placeholder) -> Optional[Dict[str, Any]]:
+    """
+    Send a message to the chat API, rendering the answer as it streams in.
+    
+    Interim text is rendered as plain text; the caller renders the final
+    message with markdown. Falls back to a plain JSON response if the API
+    does not stream.
+    
+    Returns:
+        The complete assistant message, or None on failure
+    """
     try:
-        response = httpx.post(
-            get_api_url(f"/chat/{conversation_id}"),
-            json={"message": message},
+        with get_http_client().stream(
+            "POST",
+            Endpoints.chat(conversation_id),
+            content=orjson.dumps({"message": message, "stream": True}),
+            headers={"Content-Type": "application/json"},
             timeout=60.0  # Increased timeout for long responses
-        )
+        ) as response:
+            if response.status_code != 200:
+                response.read()
+                report_error(f"Failed to send message: {response.text}")
+                return None
+            
+            if not response.headers.get("content-type", "").startswith("text/event-stream"):
+                response.read()
+                result = parse_json(response)
+            else:
+                result = None
+                event = None
+                parts = []
+                for line in response.iter_lines():
+                    if not line:
+                        event = None
+                    elif line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data = orjson.loads(line[5:])
+                        if event == "done":
+                            result = data
+                        elif event == "error":
+                            report_error(f"Failed to send message: {data.get('detail')}")
+                            return None
+                        else:
+                            parts.append(data["delta"])
+                            with placeholder.container():
+                                st.chat_message("assistant").text("".join(parts))
+                if result is None:
+                    report_error("Failed to send message: response stream ended early")
+                    return None
         
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Failed to send message: {response.text}")
-            return None
+        # The first message can set the conversation title
+        load_sidebar_data.clear()
+        return result
     except Exception as e:
-        st.error(f"Error sending message: {str(e)}")
+        report_error(f"Error sending message: {str(e)}")
         return None
 
 
 def load_conversation_history(conversation_id: str) -> None:
     """Load conversation history and update the UI."""
     conversation = get_conversation(conversation_id)
+    st.session_state.current_conversation = conversation or None
     if conversation and "messages" in conversation:
         st.session_state.messages = conversation["messages"]
 
 
 # UI Components
-def sidebar():
+def sidebar(conversations: List[Dict[str, Any]]):
     """Render the sidebar with conversations and document upload."""
     st.sidebar.title("RAG Chat System")
     
@@ -196,7 +269,8 @@ def sidebar():
     
     if uploaded_file and st.sidebar.button("Process Document"):
         with st.sidebar.status("Uploading document...") as status:
-            if upload_document(uploaded_file):
+            success, _ = upload_document(uploaded_file)
+            if success:
                 status.update(label="Document uploaded successfully!", state="complete")
                 st.sidebar.success(f"Document '{uploaded_file.name}' uploaded and being processed.")
             else:
@@ -212,13 +286,14 @@ def sidebar():
             if conversation_id:
                 st.session_state.conversation_id = conversation_id
                 st.session_state.messages = []
+                st.session_state.current_conversation = None
+                st.session_state.conv_page = 0
                 st.sidebar.success("New conversation created!")
                 st.rerun()
             else:
                 st.sidebar.error("Failed to create new conversation.")
     
     # List existing conversations
-    conversations = load_conversations()
     if conversations:
         st.sidebar.subheader("Select Conversation")
         for conv in conversations:
@@ -226,20 +301,7 @@ def sidebar():
             title = conv.get("title", "Untitled")
             created_at = conv.get("created_at", "")
             
-            # Format the date if it exists
-            if created_at:
-                try:
-                    # Parse ISO format or timestamp
-                    if isinstance(created_at, str):
-                        created_date = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
-                    else:
-                        created_date = datetime.fromtimestamp(created_at)
-                    
-                    date_str = created_date.strftime("%Y-%m-%d %H:%M")
-                except Exception as _:
-                    date_str = "Unknown date"
-            else:
-                date_str = "Unknown date"
+            date_str = format_timestamp(created_at) if created_at else "Unknown date"
             
             # Create a button for each conversation
             if st.sidebar.button(f"{title} ({date_str})", key=f"conv_{conv_id}"):
@@ -247,6 +309,17 @@ def sidebar():
                 load_conversation_history(conv_id)
                 st.rerun()
     
+    # Page through older conversations
+    page = st.session_state.conv_page
+    if page > 0 or len(conversations) == CONVERSATIONS_PER_PAGE:
+        prev_col, next_col = st.sidebar.columns(2)
+        if prev_col.button("◀ Newer", disabled=page == 0, key="conv_prev"):
+            st.session_state.conv_page -= 1
+            st.rerun()
+        if next_col.button("Older ▶", disabled=len(conversations) < CONVERSATIONS_PER_PAGE, key="conv_next"):
+            st.session_state.conv_page += 1
+            st.rerun()
+    
     # About section
     st.sidebar.header("ℹ️ About")
     st.sidebar.info(
@@ -260,7 +333,7 @@ def sidebar():
     )
 
 
-def main_content():
+def main_content(conversation: Dict[str, Any]):
     """Render the main chat interface."""
     st.title("RAG Chat System")
     
@@ -270,13 +343,16 @@ def main_content():
         return
     
     # Display conversation title
-    conversation = get_conversation(st.session_state.conversation_id)
     if conversation:
         st.subheader(f"Conversation: {conversation.get('title', 'Untitled')}")
     
-    # Display chat messages
-    for message_index, message in enumerate(st.session_state.messages):
-        format_message(message, message_index)
+    # Display the most recent chat messages; older ones only on request
+    messages = st.session_state.messages
+    start = max(len(messages) - RECENT_MESSAGES, 0)
+    if start and st.toggle(f"Show {start} earlier messages", key="show_earlier_messages"):
+        start = 0
+    for message_index in range(start, len(messages)):
+        format_message(messages[message_index], message_index)
     
     # Chat input
     if prompt := st.chat_input("Ask a question about your documents..."):
@@ -290,26 +366,45 @@ def main_content():
         }
         st.session_state.messages.append(user_message)
         
-        # Send message and get response
-        with st.spinner("Thinking..."):
-            response = send_message(st.session_state.conversation_id, prompt)
+        # Send message and stream the response
+        placeholder = st.empty()
+        response = stream_message(st.session_state.conversation_id, prompt, placeholder)
+        placeholder.empty()
+        
+        if response:
+            # The first answer sets the title, so refetch the conversation on the next rerun
+            if len(st.session_state.messages) == 1:
+                st.session_state.current_conversation = None
             
-            if response:
-                # Add assistant message to session state and display it
-                assistant_message = {
-                    "role": response["role"],
-                    "content": response["content"]
-                }
-                st.session_state.messages.append(assistant_message)
-                format_message(assistant_message, len(st.session_state.messages) - 1)
-            else:
-                st.error("Failed to get response. Please try again.")
+            # Add assistant message to session state and display it
+            assistant_message = {
+                "role": response["role"],
+                "content": response["content"]
+            }
+            st.session_state.messages.append(assistant_message)
+            format_message(assistant_message, len(st.session_state.messages) - 1)
+        else:
+            st.error("Failed to get response. Please try again.")
 
 
 # Main app layout
 def main():
-    sidebar()
-    main_content()
+    # Reuse the conversation fetched when it was selected instead of requesting it again
+    conversation_id = st.session_state.conversation_id
+    current = st.session_state.current_conversation
+    has_current = bool(current) and current.get("id") == conversation_id
+    
+    conversations, conversation = fetch_sidebar_data(
+        None if has_current else conversation_id,
+        st.session_state.conv_page
+    )
+    if has_current:
+        conversation = current
+    sidebar(conversations)
+    main_content(conversation)
+    
+    # Show API errors collected during this run
+    flush_errors()
 
 
 if __name__ == "__main__":
@@ -1,23 +1,125 @@
 import httpx
+import orjson
 import os
 import time
+import asyncio
+import hashlib
+import threading
 import streamlit as st
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
+from functools import lru_cache
 
 # Constants
 API_URL = os.getenv("API_URL", "http://localhost:8000")
 API_PREFIX = "/api/v1"
+BASE_URL = f"{API_URL}{API_PREFIX}"
 
-def get_api_url(endpoint: str) -> str:
-    """Get the full API URL for an endpoint."""
-    return f"{API_URL}{API_PREFIX}{endpoint}"
+class Endpoints:
+    """API endpoint paths, relative to BASE_URL."""
+    
+    UPLOAD = "/documents/upload"
+    NEW_CONVERSATION = "/chat/conversation"
+    CONVERSATIONS = "/chat/conversations"
+    
+    @staticmethod
+    def task(task_id: str) -> str:
+        return f"/documents/task/{task_id}"
+    
+    @staticmethod
+    def conversation(conversation_id: str) -> str:
+        return f"/chat/conversations/{conversation_id}"
+    
+    @staticmethod
+    def chat(conversation_id: str) -> str:
+        return f"/chat/{conversation_id}"
+    
+    @staticmethod
+    def feedback(conversation_id: str, message_index: int) -> str:
+        return f"/chat/{conversation_id}/messages/{message_index}/feedback"
+
+# Longest time the API holds a task status request open (seconds)
+TASK_WAIT = 30.0
+
+def parse_json(response: httpx.Response) -> Any:
+    """Parse a JSON response body with orjson, straight from the raw bytes."""
+    return orjson.loads(response.content)
+
+# Seconds during which a repeated error message is not shown again
+ERROR_REPEAT_INTERVAL = 60.0
+
+def report_error(message: str):
+    """
+    Queue an error message for display at the end of the script run.
+    
+    The same message is reported at most once per ERROR_REPEAT_INTERVAL,
+    so a flaky API does not fill the page with identical errors.
+    """
+    last_reported = st.session_state.setdefault("error_times", {})
+    now = time.monotonic()
+    if now - last_reported.get(message, float("-inf")) > ERROR_REPEAT_INTERVAL:
+        last_reported[message] = now
+        st.session_state.setdefault("pending_errors", []).append(message)
+
+def flush_errors():
+    """Show the queued error messages."""
+    for message in st.session_state.pop("pending_errors", []):
+        st.error(message)
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """Get the shared HTTP client, keeping connections to the API alive across reruns."""
+    return httpx.Client(
+        base_url=BASE_URL,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        http2=True,
+        timeout=60.0
+    )
+
+@st.cache_resource
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Get a long-lived event loop running in a background thread, shared by every session."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True, name="api-event-loop").start()
+    return loop
+
+def run_async(coro):
+    """Run a coroutine on the shared event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+@st.cache_resource
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the shared async HTTP client, used on the shared event loop only.
+    
+    Call it from the script thread and pass the client into coroutines:
+    the event loop thread has no script run context for st.cache_resource.
+    The client opens a pooled connection in the background on creation.
+    """
+    client = httpx.AsyncClient(
+        base_url=BASE_URL,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        http2=True,
+        timeout=60.0
+    )
+    asyncio.run_coroutine_threadsafe(_warm_up(client), get_event_loop())
+    return client
+
+async def _warm_up(client: httpx.AsyncClient):
+    """Open a pooled connection so the first real request skips the handshake."""
+    try:
+        await client.get(f"{API_URL}/health", timeout=2.0)
+    except httpx.HTTPError:
+        pass
 
 # Document Management
 def upload_document(file) -> Tuple[bool, Optional[str]]:
     """
     Upload a document to the API.
     
+    Files already uploaded in this session are recognized by their SHA-256
+    hash and not sent again.
+    
     Args:
         file: The uploaded file object from Streamlit
         
@@ -25,46 +127,80 @@ def upload_document(file) -> Tuple[bool, Optional[str]]:
         Tuple of (success, task_id or None)
     """
     try:
-        files = {"file": (file.name, file.getvalue(), "application/pdf")}
-        response = httpx.post(get_api_url("/documents/upload"), files=files)
+        uploaded = st.session_state.setdefault("uploaded_documents", {})
+        digest = hashlib.file_digest(file, "sha256").hexdigest()
+        if digest in uploaded:
+            return True, uploaded[digest]
+        
+        # Stream the file object itself rather than a copy of its bytes
+        file.seek(0)
+        files = {"file": (file.name, file, "application/pdf")}
+        response = get_http_client().post(
+            Endpoints.UPLOAD,
+            files=files,
+            timeout=httpx.Timeout(None, connect=5.0)  # Large uploads can take a while
+        )
         
         if response.status_code == 200:
-            return True, response.json().get("task_id")
+            task_id = parse_json(response).get("task_id")
+            uploaded[digest] = task_id
+            return True, task_id
         else:
-            st.error(f"Failed to upload document: {response.text}")
+            report_error(f"Failed to upload document: {response.text}")
             return False, None
     except Exception as e:
-        st.error(f"Error uploading document: {str(e)}")
+        report_error(f"Error uploading document: {str(e)}")
         return False, None
 
-def poll_task_status(task_id: str, max_attempts: int = 60, interval: float = 2.0) -> Dict[str, Any]:
+async def poll_task_status(
+    task_id: str,
+    client: httpx.AsyncClient,
+    deadline: float = 120.0,
+    max_errors: int = 5
+) -> Dict[str, Any]:
     """
     Poll the task status until it completes or fails.
     
+    Each request long-polls: the API holds it for up to TASK_WAIT seconds
+    until the status changes. Between requests the delay backs off
+    exponentially from 0.25 to 5 seconds. Network errors are
+    retried; polling only gives up after max_errors failures in a row.
+    Run it with run_async from the script thread, passing it the client
+    from get_async_client().
+    
     Args:
         task_id: The ID of the task to poll
-        max_attempts: Maximum number of polling attempts
-        interval: Time interval between polls in seconds
+        client: Async client to poll with
+        deadline: Maximum time to wait for the task in seconds
+        max_errors: Number of consecutive request errors to tolerate
         
     Returns:
         Task status information
     """
-    for attempt in range(max_attempts):
+    delay = 0.25
+    errors = 0
+    start = time.monotonic()
+    while time.monotonic() - start < deadline:
         try:
-            response = httpx.get(get_api_url(f"/documents/task/{task_id}"))
-            if response.status_code == 200:
-                task_data = response.json()
-                status = task_data.get("status", "")
-                
-                if status in ["completed", "failed"]:
-                    return task_data
-                
-                # Add a small delay before the next poll
-                time.sleep(interval)
-            else:
+            remaining = deadline - (time.monotonic() - start)
+            response = await client.get(
+                Endpoints.task(task_id),
+                params={"wait": max(min(remaining, TASK_WAIT), 0)}
+            )
+            if response.status_code != 200:
                 return {"status": "failed", "error": f"Failed to get task status: {response.text}"}
-        except Exception as e:
-            return {"status": "failed", "error": f"Error polling task: {str(e)}"}
+            
+            task_data = parse_json(response)
+            if task_data.get("status", "") in ["completed", "failed"]:
+                return task_data
+            errors = 0
+        except httpx.HTTPError as e:
+            errors += 1
+            if errors > max_errors:
+                return {"status": "failed", "error": f"Error polling task: {str(e)}"}
+        
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 5.0)
     
     return {"status": "timeout", "error": "Task polling timed out"}
 
@@ -72,58 +208,59 @@ def poll_task_status(task_id: str, max_attempts: int = 60, interval: float = 2.0
 def create_conversation() -> Optional[str]:
     """Create a new conversation and return its ID."""
     try:
-        response = httpx.put(get_api_url("/chat/conversation"))
+        response = get_http_client().put(Endpoints.NEW_CONVERSATION)
         if response.status_code == 200:
-            return response.json()["id"]
+            return parse_json(response)["id"]
         else:
-            st.error(f"Failed to create conversation: {response.text}")
+            report_error(f"Failed to create conversation: {response.text}")
             return None
     except Exception as e:
-        st.error(f"Error creating conversation: {str(e)}")
+        report_error(f"Error creating conversation: {str(e)}")
         return None
 
 def get_conversations(skip: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
     """Get a list of conversations with pagination."""
     try:
-        response = httpx.get(get_api_url(f"/chat/conversations?skip={skip}&limit={limit}"))
+        response = get_http_client().get(Endpoints.CONVERSATIONS, params={"skip": skip, "limit": limit})
         if response.status_code == 200:
-            return response.json()
+            return parse_json(response)
         else:
-            st.error(f"Failed to get conversations: {response.text}")
+            report_error(f"Failed to get conversations: {response.text}")
             return []
     except Exception as e:
-        st.error(f"Error getting conversations: {str(e)}")
+        report_error(f"Error getting conversations: {str(e)}")
         return []
 
 def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
     """Get a specific conversation by ID."""
     try:
-        response = httpx.get(get_api_url(f"/chat/conversations/{conversation_id}"))
+        response = get_http_client().get(Endpoints.conversation(conversation_id))
         if response.status_code == 200:
-            return response.json()
+            return parse_json(response)
         else:
-            st.error(f"Failed to get conversation: {response.text}")
+            report_error(f"Failed to get conversation: {response.text}")
             return None
     except Exception as e:
-        st.error(f"Error getting conversation: {str(e)}")
+        report_error(f"Error getting conversation: {str(e)}")
         return None
 
 def delete_conversation(conversation_id: str) -> bool:
     """Delete a conversation by ID."""
     try:
-        response = httpx.delete(get_api_url(f"/chat/conversations/{conversation_id}"))
+        response = get_http_client().delete(Endpoints.conversation(conversation_id))
         if response.status_code == 200:
             return True
         else:
-            st.error(f"Failed to delete conversation: {response.text}")
+            report_error(f"Failed to delete conversation: {response.text}")
             return False
     except Exception as e:
-        st.error(f"Error deleting conversation: {str(e)}")
+        report_error(f"Error deleting conversation: {str(e)}")
         return False
 
 # Utility Functions
+@lru_cache(maxsize=2048)
 def format_timestamp(timestamp_str: str) -> str:
-    """Format an ISO timestamp to a human-readable format."""
+    """Format an ISO timestamp to a human-readable format, memoized across reruns."""
     try:
         if not timestamp_str:
             return "Unknown"
@@ -138,13 +275,12 @@ def format_timestamp(timestamp_str: str) -> str:
     except Exception:
         return "Invalid date"
 
+# File size units, indexed by log2(size) // 10
+_UNITS = (("bytes", 1), ("KB", 1024), ("MB", 1024 ** 2), ("GB", 1024 ** 3))
+
 def format_file_size(size_bytes: int) -> str:
     """Format file size in bytes to human-readable format."""
     if size_bytes < 1024:
         return f"{size_bytes} bytes"
-    elif size_bytes < 1024 * 1024:
-        return f"{size_bytes / 1024:.1f} KB"
-    elif size_bytes < 1024 * 1024 * 1024:
-        return f"{size_bytes / (1024 * 1024):.1f} MB"
-    else:
-        return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB" 
\ No newline at end of file
+    name, divisor = _UNITS[min((size_bytes.bit_length() - 1) // 10, 3)]
+    return f"{size_bytes / divisor:.1f} {name}"